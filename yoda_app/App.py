@@ -1,9 +1,14 @@
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget
+from PyQt6.QtCore import pyqtSignal
 from Dashboard import DashboardWidget
 from Uploads import UploadWidget  # Make sure your UploadWidget file matches this
+from Enrichment import MetadataRefresher
+from Config import API_KEY, DB_NAME, METADATA_TTL_DAYS, REFRESH_DAILY_QUOTA, REFRESH_INTERVAL_S
 
 class MainApp(QMainWindow):
+    metadata_refreshed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("YODA - Youtube Ordinary Data Analyzer")
@@ -17,10 +22,21 @@ class MainApp(QMainWindow):
         self.dashboard_page = DashboardWidget()
         self.upload_page = UploadWidget()
         self.upload_page.upload_done.connect(self.dashboard_page.reload_data)
+        self.upload_page.enrichment_progress.connect(self.dashboard_page.refresh_data)
+        self.upload_page.enrichment_done.connect(self.dashboard_page.refresh_data)
 
         self.tabs.addTab(self.dashboard_page, "Dashboard")
         self.tabs.addTab(self.upload_page, "Uploads")
 
+        # Keep cached video metadata fresh without re-uploading
+        self.metadata_refreshed.connect(self.dashboard_page.refresh_data)
+        self.refresher = MetadataRefresher(
+            API_KEY, DB_NAME, METADATA_TTL_DAYS, REFRESH_DAILY_QUOTA, interval_s=REFRESH_INTERVAL_S,
+            is_busy=lambda: self.upload_page.enricher is not None and self.upload_page.enricher.is_running(),
+            on_batch=lambda _: self.metadata_refreshed.emit()
+        )
+        self.refresher.start()
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,135 @@
+# Benchmark.py
+"""Compare the bulk writer with DataFrame.to_sql on synthetic watch history.
+
+Usage: python Benchmark.py [rows ...]    (default: 100000 1000000 5000000)
+
+For every size it reports two comparisons:
+  writer  - the same watch_events rows into the same keyed/indexed partition table, once with
+            DataFrame.to_sql on a default connection and once with BulkWriter on a tuned one
+  ingest  - the old save path (to_sql of the flat frame into a fresh file) against
+            Database.save_to_database (dimension lookups, upsert, WAL, batched executemany)
+During the bulk ingest a second thread polls the DB to show readers are never blocked.
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from Database import Database
+from BulkWriter import BulkWriter, tune_connection
+from Partitions import PartitionStore
+
+def make_watch_df(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2015-01-01", tz="UTC").value // 1000
+    span_us = 10 * 365 * 86_400_000_000
+    video_ids = np.array([f"v{i:010d}" for i in range(max(rows // 3, 1))], dtype=object)
+    channels = np.array([f"Channel {i}" for i in range(5000)], dtype=object)
+    videos = rng.integers(0, len(video_ids), rows)
+    return pd.DataFrame({
+        "time": pd.to_datetime(np.sort(start + rng.choice(span_us, rows, replace=False)), unit="us", utc=True),
+        "title": "Video " + pd.Series(video_ids[videos]),
+        "channel_name": channels[videos % len(channels)],
+        "video_id": video_ids[videos],
+        "category_id": None,
+        "category_name": None,
+        "video_description": None,
+    })
+
+def empty_search_df():
+    return pd.DataFrame({"time": pd.Series([], dtype="datetime64[us, UTC]"), "title": [], "category_guess": []})
+
+def bench_to_sql(watch_df, path):
+    conn = sqlite3.connect(path)
+    t0 = time.perf_counter()
+    watch_df.to_sql("watch_history", conn, index=False)
+    conn.commit()
+    elapsed = time.perf_counter() - t0
+    conn.close()
+    return elapsed
+
+def make_event_rows(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2015-01-01", tz="UTC").value // 1000
+    videos = rng.integers(1, max(rows // 3, 1) + 1, rows)
+    return pd.DataFrame({
+        "time_us": np.sort(start + rng.choice(10 * 365 * 86_400_000_000, rows, replace=False)),
+        "channel_key": videos % 5000 + 1,
+        "video_key": videos,
+        "category_key": videos % 15 + 1,
+    }).assign(local_day=lambda df: df["time_us"] // 86_400_000_000)
+
+def bench_writer_to_sql(events, path):
+    conn = sqlite3.connect(path)
+    PartitionStore.create_schema(conn)
+    t0 = time.perf_counter()
+    events.to_sql("watch_events", conn, if_exists="append", index=False)
+    conn.commit()
+    elapsed = time.perf_counter() - t0
+    conn.close()
+    return elapsed
+
+def bench_writer_bulk(events, path):
+    conn = tune_connection(sqlite3.connect(path))
+    PartitionStore.create_schema(conn)
+    writer = BulkWriter(conn)
+    t0 = time.perf_counter()
+    with conn, writer.deferred_indexes("watch_events"):
+        writer.write("""INSERT INTO watch_events (time_us, channel_key, video_key, category_key, local_day)
+                        VALUES (?, ?, ?, ?, ?)""",
+                     events.itertuples(index=False, name=None))
+    elapsed = time.perf_counter() - t0
+    conn.close()
+    return elapsed
+
+def bench_bulk(watch_df, path):
+    Database(path).connect().close()  # schema and WAL set up outside the timed section
+    stop = threading.Event()
+    reads = {"count": 0, "errors": 0, "max_s": 0.0}
+
+    def reader():
+        conn = sqlite3.connect(path, timeout=0)
+        while not stop.is_set():
+            t = time.perf_counter()
+            try:
+                conn.execute("SELECT SUM(n) FROM watch_daily").fetchone()
+                reads["count"] += 1
+                reads["max_s"] = max(reads["max_s"], time.perf_counter() - t)
+            except sqlite3.OperationalError:
+                reads["errors"] += 1
+            time.sleep(0.01)
+        conn.close()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    t0 = time.perf_counter()
+    Database(path).save_to_database(watch_df, empty_search_df())
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    thread.join()
+    return elapsed, reads
+
+def main(sizes):
+    print(f"{'':>7} {'rows':>10} {'to_sql s':>10} {'bulk s':>10} {'speedup':>8} {'rows/s':>12} "
+          f"{'reads':>6} {'blocked':>8} {'max read ms':>12}")
+    for rows in sizes:
+        events = make_event_rows(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            to_sql_s = bench_writer_to_sql(events, os.path.join(tmp, "to_sql.db"))
+            bulk_s = bench_writer_bulk(events, os.path.join(tmp, "bulk.db"))
+        print(f"{'writer':>7} {rows:>10} {to_sql_s:>10.2f} {bulk_s:>10.2f} {to_sql_s / bulk_s:>8.2f} "
+              f"{rows / bulk_s:>12,.0f}")
+        del events
+
+        watch_df = make_watch_df(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            to_sql_s = bench_to_sql(watch_df, os.path.join(tmp, "to_sql.db"))
+            bulk_s, reads = bench_bulk(watch_df, os.path.join(tmp, "bulk.db"))
+        print(f"{'ingest':>7} {rows:>10} {to_sql_s:>10.2f} {bulk_s:>10.2f} {to_sql_s / bulk_s:>8.2f} "
+              f"{rows / bulk_s:>12,.0f} {reads['count']:>6} {reads['errors']:>8} {reads['max_s'] * 1000:>12.1f}")
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [100_000, 1_000_000, 5_000_000])
@@ -0,0 +1,72 @@
+# BulkWriter.py
+from contextlib import contextmanager
+from itertools import islice
+
+# Connection tuning shared by every connection to the history DB
+CACHE_SIZE_KB = 64 * 1024        # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024    # read pages straight from the OS page cache
+BUSY_TIMEOUT_S = 30              # writers wait for each other instead of failing
+BATCH_ROWS = 50_000              # rows bound per executemany call
+STATEMENT_CACHE = 256            # prepared statements kept per connection
+
+def tune_connection(conn):
+    """Apply the pragmas used for all history DB connections.
+
+    WAL lets dashboard readers keep working on the last committed snapshot while an ingest is
+    writing, and with WAL `synchronous=NORMAL` is still crash-safe (only the last commit can be lost).
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return tune_read_connection(conn)
+
+def tune_read_connection(conn):
+    """The pragmas of tune_connection that a read-only connection can apply (the journal mode is the file's)"""
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+class BulkWriter:
+    """Write large row streams through one prepared statement per SQL string.
+
+    Rows are bound in batches with executemany, which prepares the statement once and rebinds it
+    for every row; the connection's statement cache keeps it prepared across batches and calls.
+    The caller owns the transaction, so a whole ingest commits (or rolls back) as one unit.
+    """
+    def __init__(self, conn, batch_rows=BATCH_ROWS):
+        self.conn = conn
+        self.batch_rows = batch_rows
+
+    def write(self, sql, rows):
+        """Execute `sql` for every row of the iterable; returns the number of rows changed"""
+        before = self.conn.total_changes
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_rows))
+            if not batch:
+                break
+            self.conn.executemany(sql, batch)
+        return self.conn.total_changes - before
+
+    @contextmanager
+    def deferred_indexes(self, table, enabled=True):
+        """Drop `table`'s secondary indexes for the duration and rebuild each once at the end.
+
+        Building an index from sorted data is much cheaper than updating it row by row, which pays
+        off when a write adds more rows than the table already holds (e.g. the first import).
+        UNIQUE constraints are left in place because the upserts rely on them.
+        """
+        if not enabled:
+            yield
+            return
+        indexes = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        ).fetchall()
+        for name, _ in indexes:
+            self.conn.execute(f"DROP INDEX {name}")
+        try:
+            yield
+        finally:
+            for _, sql in indexes:
+                self.conn.execute(sql)
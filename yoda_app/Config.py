@@ -6,3 +6,13 @@ API_KEY = os.getenv("YT_API_KEY")
 DB_NAME = "yt_history.db"
 DASH_PORT = 8050
 DASH_URL = f"http://127.0.0.1:{DASH_PORT}"
+DASHBOARD_REFRESH_MS = 3000
+METADATA_TTL_DAYS = 30
+REFRESH_DAILY_QUOTA = 100  # YouTube API units per day reserved for refreshing stale metadata (1 unit = 50 videos)
+REFRESH_INTERVAL_S = 3600
+TIMEZONE = "UTC"  # IANA zone whose calendar days the dashboard counts in, e.g. "Europe/London"
+FIGURE_CACHE_MB = 64  # built dashboard figures kept for repeated views
+QUERY_BACKEND = "memory"  # rollups cached in memory; "sqlite" queries them in place, "duckdb" aggregates the Arrow snapshot (needs duckdb and pyarrow)
+SERVER_HOST = "127.0.0.1"  # headless Server.py; "0.0.0.0" to serve other machines
+SERVER_THREADS = 8
+CLIENT_ROLLUP_ROWS = 200_000  # rollups up to this many rows are sent to the browser and filtered there
@@ -0,0 +1,78 @@
+# ConnectionPool.py
+import os
+import pathlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from BulkWriter import tune_read_connection, BUSY_TIMEOUT_S, STATEMENT_CACHE
+from Database import Database, normalize_term
+
+MAX_IDLE = 8  # connections kept open between callbacks
+
+class ReadConnectionPool:
+    """Long-lived read-only connections to the history DB, shared by the dashboard's server threads.
+
+    A callback checks a connection out, uses it on its own thread and hands it back, so connection
+    setup, prepared statements and the page cache outlive the callback. A connection is replaced
+    when another connection has committed since it was opened (SQLite would drop its page cache
+    for that anyway), or when the DB file has been replaced since (deleted and created again, which
+    no commit to the old file would ever show), so a checkout always starts from the latest schema
+    and data.
+    """
+    def __init__(self, db_name, max_idle=MAX_IDLE):
+        self.db_name = db_name
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._schema_ready = None  # identity of the file whose schema is known to be current
+
+    def _identity(self):
+        """(device, inode) of the DB file; None if there is none"""
+        try:
+            st = os.stat(self.db_name)
+        except FileNotFoundError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def _open(self):
+        identity = self._identity()
+        if identity is None or identity != self._schema_ready:
+            # Read-only connections cannot create or migrate the schema
+            Database(self.db_name).connect().close()
+            identity = self._schema_ready = self._identity()
+        uri = pathlib.Path(self.db_name).absolute().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE,
+                               check_same_thread=False)
+        conn.create_function("normalize_term", 1, normalize_term, deterministic=True)
+        tune_read_connection(conn)
+        return conn, conn.execute("PRAGMA data_version").fetchone()[0], identity
+
+    @contextmanager
+    def connection(self):
+        """Check out a read-only connection for the duration of the block"""
+        with self._lock:
+            held = self._idle.pop() if self._idle else None
+        if held is not None and (held[2] != self._identity() or
+                                held[0].execute("PRAGMA data_version").fetchone()[0] != held[1]):
+            held[0].close()
+            held = None
+        if held is None:
+            held = self._open()
+        try:
+            yield held[0]
+        finally:
+            if held[0].in_transaction:
+                held[0].rollback()
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(held)
+                    held = None
+            if held is not None:
+                held[0].close()
+
+    def close(self):
+        """Close the idle connections; the next checkout opens a fresh one"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _, _ in idle:
+            conn.close()
@@ -0,0 +1,606 @@
+# DashboardApp.py
+import json
+import numpy as np
+import pandas as pd
+import textwrap
+import dash
+from dash import dcc, html, Output, Input, State, ClientsideFunction
+from dash.exceptions import PreventUpdate
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from Config import DB_NAME, DASHBOARD_REFRESH_MS, QUERY_BACKEND, FIGURE_CACHE_MB, CLIENT_ROLLUP_ROWS
+from Queries import make_queries, make_filters, day_to_date, pick_unit, binned_counts
+from DatasetCache import DatasetCache
+from FigureCache import FigureCache
+from Downsample import downsample
+
+# (tab value, tab label, graph id); DashboardApp.chart_<tab value> builds each figure
+CHARTS = [
+    ('channels', 'Top Channels', 'fig-channels'),
+    ('searches', 'Top Searches', 'fig-search'),
+    ('categories', 'Category Distribution', 'fig-category'),
+    ('daily', 'Daily Videos', 'fig-daily'),
+    ('weekly', 'Weekly Videos', 'fig-weekly'),
+    ('category_time', 'Category Over Time', 'fig-cat-time'),
+    ('correlation', 'Search vs Watch', 'fig-corr'),
+]
+# Charts drawn in the browser (assets/charts.js, one function per tab) from the 'rollups' store;
+# a text filter, which needs per-event rows, or rollups too large to send, leaves them to the server
+CLIENT_CHARTS = {'channels', 'searches', 'categories'}
+TOP_N = 10
+# Categories below this share of the videos are merged into 'Others' on the category charts
+OTHERS_SHARE = 0.02
+# Width at which bar labels (channels, search terms) and pie labels (categories) wrap
+BAR_LABEL_WIDTH = 20
+PIE_LABEL_WIDTH = 15
+# Time-series traces are cut down to about one point per pixel of the page width
+POINTS_PER_PX = 1
+DEFAULT_PLOT_WIDTH = 1200  # until the page has reported its width
+# Charts re-aggregated for the range they are zoomed to: the activity chart picks bins of about two
+# points of budget each, the weekly chart keeps its weeks but only thins out the ones on screen
+ZOOMABLE = {'daily', 'weekly'}
+# Controls inside a chart's tab, passed to its builder after the filters
+CHART_OPTIONS = {'correlation': [('corr-mode', 'value')]}
+# Traces with more points than this are drawn with WebGL (Scattergl) instead of SVG
+WEBGL_POINTS = 1000
+# The correlation chart's 'auto' mode switches to a density map above this many days
+DENSITY_POINTS = 2000
+DENSITY_BINS = 40
+ACTIVITY_TITLES = {'hour': "Hourly Videos Watched", 'day': "Daily Videos Watched",
+                   'week': "Weekly Videos Watched", 'month': "Monthly Videos Watched"}
+
+def visible_range(relayout):
+    """(start, end) of the x axis after a zoom or pan, or None once it is reset to show everything.
+
+    Other layout changes (autosize, drag mode, ...) raise PreventUpdate, as they need no redraw.
+    """
+    relayout = relayout or {}
+    if 'xaxis.range[0]' in relayout:
+        return pd.Timestamp(relayout['xaxis.range[0]']), pd.Timestamp(relayout['xaxis.range[1]'])
+    if 'xaxis.range' in relayout:
+        return pd.Timestamp(relayout['xaxis.range'][0]), pd.Timestamp(relayout['xaxis.range'][1])
+    if relayout.get('xaxis.autorange'):
+        return None
+    raise PreventUpdate
+
+def zoomed_filters(filters, view):
+    """The filters narrowed to the dates of a visible (start, end) range"""
+    start, end = view[0].date(), view[1].date()
+    return filters._replace(start_date=max(start, filters.start_date) if filters.start_date else start,
+                            end_date=min(end, filters.end_date) if filters.end_date else end)
+
+def wrap_labels(labels, width):
+    return [textwrap.fill(str(label), width) for label in labels]
+
+def stamp_key(stamp):
+    """A query layer's (db_id, data_version) as a string for the page; the id does not fit a JavaScript number"""
+    return None if stamp is None else "%d:%d" % stamp
+
+def figure_json(fig):
+    return json.loads(pio.to_json(fig, validate=False))
+
+def line_trace(x, y, **kwargs):
+    """A Scatter trace, or Scattergl once there are too many points for SVG"""
+    return (go.Scattergl if len(x) > WEBGL_POINTS else go.Scatter)(x=x, y=y, **kwargs)
+
+def render_mode(n):
+    return 'webgl' if n > WEBGL_POINTS else 'svg'
+
+class DashboardApp:
+    """The Dash app behind the dashboard: layout, callbacks and chart builders.
+
+    It has no Qt dependency: DashboardWidget serves it inside the desktop window and Server.py
+    serves it headless. `server` is the Flask app to hand to any WSGI server.
+    """
+    def __init__(self, db_name=DB_NAME, backend=QUERY_BACKEND):
+        # Every chart asks the query layer for just the aggregate it draws
+        self.queries = make_queries(db_name, backend)
+        # Shared with the memory backend; reread only when the DB's stamp (id and data version) moves
+        self.dataset = DatasetCache.shared(db_name)
+        self.figures = FigureCache(FIGURE_CACHE_MB * 2**20)
+        # What the browser-side charts draw from (see client_rollups)
+        self._client_rollups = None
+
+        # Dash placeholders
+        self.has_data = False
+        self.date_range = (None, None)
+        self.channels = []
+        self.categories = []
+
+        # Bumped by refresh_data/reload_data; open pages poll it together with the DB's own data
+        # version and redraw without a full reload
+        self.data_version = 0
+
+        # Dash app; CSS comes from assets/ and Dash's own scripts are served locally, so no network is needed
+        self.app = dash.Dash(__name__, serve_locally=True, suppress_callback_exceptions=True)
+        self.app.layout = self.serve_layout
+        self.server = self.app.server
+
+        # Dash callbacks
+        self.register_callbacks()
+
+    def load_data(self):
+        """Load the dataset summary (bounds and filter choices) from the cached dataset"""
+        dataset = self.dataset.get()
+        if dataset is None:
+            self.has_data, self.date_range, self.channels, self.categories = False, (None, None), [], []
+            return
+        self.has_data = not (dataset.watch.empty and dataset.search.empty)
+        if len(dataset.watch):
+            first, last = day_to_date([dataset.watch["day"].min(), dataset.watch["day"].max()])
+            self.date_range = (first.date(), last.date())
+        else:
+            self.date_range = (None, None)
+        self.channels = dataset.channels
+        self.categories = dataset.categories
+
+    def page_version(self):
+        """What an open page compares against to notice new data. The DB's stamp covers writes from
+        any process, and a replaced DB, so headless workers that never see refresh_data still pick them up."""
+        return [self.data_version, stamp_key(self.queries.stamp())]
+
+    def client_rollups(self):
+        """The rollups for the browser-side charts, built once per DB stamp; None without a DB
+        or beyond CLIENT_ROLLUP_ROWS rows, where the server draws those charts instead.
+
+        Columnar and dictionary-encoded: labels are sent once, rows carry their codes, and the
+        day-sorted day column is sent as differences from the row before (mostly 0 or 1). Labels
+        come already wrapped, and each chart comes as an empty figure from the same builder the
+        server uses, so both draw identical charts.
+        """
+        dataset = self.dataset.get()
+        if dataset is None:
+            return None
+        cached = self._client_rollups
+        # A re-created DB starts its version again, so the page and this cache go by the whole stamp
+        version = stamp_key((dataset.db_id, dataset.version))
+        if cached is not None and cached['version'] == version:
+            return None if cached.get('skipped') else cached
+        watch, search = dataset.watch, dataset.search
+        if len(watch) + len(search) > CLIENT_ROLLUP_ROWS:
+            self._client_rollups = {'version': version, 'skipped': True}
+            return None
+        figures = {
+            'channels': figure_json(self.channels_figure([''], [0])),
+            'searches': figure_json(self.searches_figure([''], [0])),
+            'categories': figure_json(self.categories_figure([''], [0])),
+        }
+        # The template is the bulk of each figure and the same for all of them
+        template = [fig['layout'].pop('template') for fig in figures.values()][0]
+        channels = watch['channel_name'].cat.categories
+        categories = watch['category_name'].cat.categories
+        self._client_rollups = {
+            'version': version,
+            'top_n': TOP_N,
+            'others_share': OTHERS_SHARE,
+            'channels': list(channels),
+            'categories': list(categories),
+            'labels': {
+                'channels': wrap_labels(channels, BAR_LABEL_WIDTH),
+                'terms': wrap_labels(search['term'].cat.categories, BAR_LABEL_WIDTH),
+                'categories': wrap_labels(categories, PIE_LABEL_WIDTH),
+                'others': wrap_labels(['Others'], PIE_LABEL_WIDTH)[0],
+            },
+            'watch': {
+                'day': np.diff(watch['day'].to_numpy(), prepend=0).tolist(),
+                'channel': watch['channel_name'].cat.codes.tolist(),
+                'category': watch['category_name'].cat.codes.tolist(),
+                'n': watch['n'].tolist(),
+            },
+            'search': {
+                'day': np.diff(search['day'].to_numpy(), prepend=0).tolist(),
+                'term': search['term'].cat.codes.tolist(),
+                'n': search['n'].tolist(),
+            },
+            'template': template,
+            'figures': figures,
+        }
+        return self._client_rollups
+
+    def get_dropdown_options(self):
+        channels_options = [{'label': c, 'value': c} for c in self.channels]
+        categories_options = [{'label': c, 'value': c} for c in self.categories]
+        return channels_options, categories_options
+
+    def serve_layout(self):
+        """Build the layout from the current DB so a page reload picks up freshly ingested rows"""
+        self.load_data()
+        return self.get_layout(*self.get_dropdown_options())
+
+    def get_layout(self, channels_options, categories_options):
+        # Placeholder if no data
+        title_div = html.Div(
+            html.H1("Youtube Ordinary Data Analyzer", style={
+                'color': 'white',
+                'margin': '0',
+                'fontFamily': 'Arial, sans-serif',
+                'fontWeight': 'bold',
+                'textAlign': 'center'
+            }),
+            style={
+                'backgroundColor': '#FF0000',
+                'padding': '15px 0',
+                'boxShadow': '0 2px 5px rgba(0,0,0,0.3)',
+                'borderRadius': '5px',
+                'marginBottom': '15px'
+            }
+        )
+
+        if not self.has_data:
+            # Body message placeholder
+            body_message = html.Div(
+                "No data available. Please upload watch and search history to see the dashboard.",
+                style={'marginTop': '50px', 'textAlign': 'center', 'fontSize': '18px', 'color': '#555'}
+            )
+            return html.Div([title_div, body_message])
+
+        return html.Div([
+            # Title
+            html.Div([html.H1("YODA Dashboard", style={
+                'color': 'white',
+                'margin': '0',
+                'fontFamily': 'Arial, sans-serif',
+                'fontWeight': 'bold',
+                'textAlign': 'center'
+            })], style={
+                'backgroundColor': '#FF0000',
+                'padding': '15px 0',
+                'boxShadow': '0 2px 5px rgba(0,0,0,0.3)',
+                'borderRadius': '5px',
+                'marginBottom': '15px'
+            }),
+
+            # Data version polling
+            dcc.Store(id='data-version', data=self.page_version()),
+            dcc.Interval(id='refresh-interval', interval=DASHBOARD_REFRESH_MS),
+            dcc.Store(id='plot-width'),
+            # Browser-side charts: their data, and the server's figure when they cannot be drawn from it
+            dcc.Store(id='rollups', data=self.client_rollups()),
+            dcc.Store(id='server-query'),
+            dcc.Store(id='server-figure'),
+
+            # Filters
+            html.Div([
+                html.Div([
+                    html.Label("Date Range:", style={'fontSize':'12px'}),
+                    dcc.DatePickerRange(
+                        id='date-picker',
+                        min_date_allowed=self.date_range[0] or pd.Timestamp.today().date(),
+                        max_date_allowed=self.date_range[1] or pd.Timestamp.today().date(),
+                        start_date=self.date_range[0] or pd.Timestamp.today().date(),
+                        end_date=self.date_range[1] or pd.Timestamp.today().date(),
+                        display_format='YYYY-MM-DD',
+                        clearable=True,
+                        style={'fontSize':'12px'}
+                    )
+                ], style={'marginRight':'15px'}),
+
+                html.Div([
+                    html.Label("Channel:", style={'fontSize':'12px'}),
+                    dcc.Dropdown(
+                        id='channel-dropdown',
+                        options=[{'label':'All','value':'All'}]+channels_options,
+                        value='All',
+                        multi=False,
+                        clearable=False,
+                        style={'width':'180px', 'fontSize':'12px', 'lineHeight':'20px'}
+                    )
+                ], style={'marginRight':'15px'}),
+
+                html.Div([
+                    html.Label("Category:", style={'fontSize':'12px'}),
+                    dcc.Dropdown(
+                        id='category-dropdown',
+                        options=[{'label':'All','value':'All'}]+categories_options,
+                        value='All',
+                        multi=False,
+                        clearable=False,
+                        style={'width':'180px', 'fontSize':'12px', 'lineHeight':'20px'}
+                    )
+                ], style={'marginRight':'15px'}),
+
+                html.Div([
+                    html.Label("Search:", style={'fontSize':'12px'}),
+                    dcc.Input(
+                        id='search-text',
+                        type='search',
+                        placeholder='Titles, descriptions, searches',
+                        debounce=True,
+                        style={'width':'220px', 'fontSize':'12px', 'height':'34px'}
+                    )
+                ])
+            ], style={
+                'display':'flex',
+                'alignItems':'center',
+                'gap':'15px',
+                'padding':'10px 5px',
+                'position':'relative',
+                'marginTop':'20px'
+            }),
+
+            # Tabs; each chart is only computed while its tab is showing
+            dcc.Tabs(id='chart-tabs', value=CHARTS[0][0], children=[
+                dcc.Tab(label=label, value=tab,
+                        children=self.chart_controls(tab) + [dcc.Graph(id=graph_id, style={'height':'400px'})])
+                for tab, label, graph_id in CHARTS
+            ], style={'fontSize':'12px','marginTop':'20px','marginBottom':'15px'})
+        ])
+
+    @staticmethod
+    def chart_controls(tab):
+        if tab == 'correlation':
+            return [dcc.RadioItems(
+                id='corr-mode',
+                options=[{'label':'Auto','value':'auto'}, {'label':'Points','value':'points'},
+                         {'label':'Density','value':'density'}],
+                value='auto',
+                inline=True,
+                style={'fontSize':'12px','marginTop':'10px'}
+            )]
+        return []
+
+    def register_callbacks(self):
+        @self.app.callback(
+            Output('data-version', 'data'),
+            Output('channel-dropdown', 'options'),
+            Output('category-dropdown', 'options'),
+            Output('rollups', 'data'),
+            Input('refresh-interval', 'n_intervals'),
+            State('data-version', 'data')
+        )
+        def sync_data_version(_, rendered_version):
+            version = self.page_version()
+            if rendered_version == version:
+                raise PreventUpdate
+            self.load_data()
+            channels_options, categories_options = self.get_dropdown_options()
+            return (version,
+                    [{'label':'All','value':'All'}]+channels_options,
+                    [{'label':'All','value':'All'}]+categories_options,
+                    self.client_rollups())
+
+        # The page reports its width, which sets the point budget of the time-series charts
+        self.app.clientside_callback(
+            """function(tab, width) {
+                return window.innerWidth === width ? window.dash_clientside.no_update : window.innerWidth;
+            }""",
+            Output('plot-width', 'data'),
+            Input('chart-tabs', 'value'),
+            State('plot-width', 'data')
+        )
+
+        for tab, _, graph_id in CHARTS:
+            if tab in CLIENT_CHARTS:
+                self.register_client_chart(tab, graph_id)
+            else:
+                self.register_chart(tab, graph_id, getattr(self, 'chart_' + tab))
+
+        # With a text filter, or without rollups, a browser-side chart's tab asks the server for its figure
+        self.app.clientside_callback(
+            ClientsideFunction('yoda', 'server_query'),
+            Output('server-query', 'data'),
+            Input('chart-tabs', 'value'),
+            Input('date-picker', 'start_date'),
+            Input('date-picker', 'end_date'),
+            Input('channel-dropdown', 'value'),
+            Input('category-dropdown', 'value'),
+            Input('search-text', 'value'),
+            Input('data-version', 'data'),
+            Input('rollups', 'data')
+        )
+
+        @self.app.callback(
+            Output('server-figure', 'data'),
+            Input('server-query', 'data'),
+            prevent_initial_call=True
+        )
+        def update_server_figure(query):
+            tab = query['tab']
+            if tab not in CLIENT_CHARTS:
+                raise PreventUpdate
+            filters = make_filters(query['start_date'], query['end_date'], query['channel'], query['category'],
+                                   query['text'])
+            with self.queries.pinned():
+                key = (self.queries.stamp(), filters, tab)
+                figure = self.figures.get(key)
+                if figure is None:
+                    figure = self.figures.put(key, getattr(self, 'chart_' + tab)(filters, None))
+            # The page shows it only while its filters still match the query
+            return {'query': query, 'figure': figure}
+
+    def register_client_chart(self, tab, graph_id):
+        """A chart filtered and ranked in the browser from the rollups store (assets/charts.js)"""
+        self.app.clientside_callback(
+            ClientsideFunction('yoda', tab),
+            Output(graph_id, 'figure'),
+            Input('chart-tabs', 'value'),
+            Input('date-picker', 'start_date'),
+            Input('date-picker', 'end_date'),
+            Input('channel-dropdown', 'value'),
+            Input('category-dropdown', 'value'),
+            Input('search-text', 'value'),
+            Input('rollups', 'data'),
+            Input('server-figure', 'data')
+        )
+
+    def register_chart(self, tab, graph_id, build):
+        """One callback per chart: a filter change redraws the visible chart, and a hidden one is
+        redrawn when its tab is opened. Zoomable charts also redraw for the range they are zoomed to."""
+        zoom = [Input(graph_id, 'relayoutData')] if tab in ZOOMABLE else []
+        options = [Input(component, prop) for component, prop in CHART_OPTIONS.get(tab, [])]
+
+        @self.app.callback(
+            Output(graph_id, 'figure'),
+            Input('chart-tabs', 'value'),
+            Input('date-picker', 'start_date'),
+            Input('date-picker', 'end_date'),
+            Input('channel-dropdown', 'value'),
+            Input('category-dropdown', 'value'),
+            Input('search-text', 'value'),
+            Input('data-version', 'data'),
+            Input('plot-width', 'data'),
+            *zoom,
+            *options
+        )
+        def update_chart(active_tab, start_date, end_date, selected_channel, selected_category, search_text, _,
+                         plot_width, *extra):
+            if active_tab != tab:
+                raise PreventUpdate
+            relayout, option_values = (extra[0], extra[1:]) if zoom else (None, extra)
+            filters = make_filters(start_date, end_date, selected_channel, selected_category, search_text)
+            points = int((plot_width or DEFAULT_PLOT_WIDTH) * POINTS_PER_PX)
+            # A filter change shows the whole filtered range again
+            view = visible_range(relayout) if zoom and dash.ctx.triggered_id == graph_id else None
+            # Charts that combine several aggregates read them from one version of the data
+            with self.queries.pinned():
+                key = (self.queries.stamp(), filters, tab, points, view, *option_values)
+                figure = self.figures.get(key)
+                if figure is None:
+                    args = [view] if zoom else []
+                    figure = self.figures.put(key, build(filters, points, *args, *option_values))
+                return figure
+
+    # --- Charts ---
+    # channels, searches and categories are usually drawn in the browser (assets/charts.js) from the
+    # *_figure builders' output; these build them on the server when a text filter is set or the
+    # rollups are too large to send
+    def chart_channels(self, filters, points):
+        channel_counts = self.queries.top_channels(filters, TOP_N)
+        if channel_counts.empty:
+            return go.Figure()
+        return self.channels_figure(wrap_labels(channel_counts.index, BAR_LABEL_WIDTH), channel_counts.values)
+
+    def chart_searches(self, filters, points):
+        search_counts = self.queries.top_searches(filters, TOP_N)
+        if search_counts.empty:
+            return go.Figure()
+        return self.searches_figure(wrap_labels(search_counts.index, BAR_LABEL_WIDTH), search_counts.values)
+
+    def chart_categories(self, filters, points):
+        category_counts = self.queries.category_counts(filters)
+        if category_counts.empty:
+            return go.Figure()
+        total = category_counts.sum()
+        small_sum = category_counts[category_counts/total < OTHERS_SHARE].sum()
+        large = category_counts[category_counts/total >= OTHERS_SHARE].copy()
+        if small_sum > 0:
+            large = pd.concat([large, pd.Series({'Others': small_sum})])
+        large_sorted = large.sort_values(ascending=False, kind='stable')
+        return self.categories_figure(wrap_labels(large_sorted.index, PIE_LABEL_WIDTH), large_sorted.values)
+
+    @staticmethod
+    def channels_figure(labels, counts):
+        fig = px.bar(x=counts, y=labels, orientation='h', text=counts,
+                     labels={'x':'Videos Watched','y':'Channel'}, title="Top Channels Watched")
+        fig.update_yaxes(autorange="reversed")
+        return fig
+
+    @staticmethod
+    def searches_figure(labels, counts):
+        fig = px.bar(x=counts, y=labels, orientation='h', text=counts,
+                     labels={'x':'Search Count','y':'Search Term'}, title="Top Search Terms")
+        fig.update_yaxes(autorange="reversed")
+        return fig
+
+    @staticmethod
+    def categories_figure(labels, counts):
+        return px.pie(names=labels, values=counts, title="Video Category Distribution")
+
+    def chart_daily(self, filters, points, view=None):
+        """Videos watched over time, in hourly to monthly bins depending on the range on screen"""
+        if view is not None:
+            filters = zoomed_filters(filters, view)
+            span = view[1] - view[0]
+        else:
+            first, last = self.queries.date_range()
+            start, end = filters.start_date or first, filters.end_date or last
+            if start is None or end is None:
+                return go.Figure()
+            span = pd.Timestamp(end) - pd.Timestamp(start) + pd.Timedelta(days=1)
+        unit = pick_unit(span, points // 2)
+        counts = downsample(binned_counts(self.queries, filters, unit), points)
+        if counts.empty:
+            return go.Figure()
+        fig = px.line(x=counts.index, y=counts.values, render_mode=render_mode(len(counts)),
+                      labels={'x':'Date','y':'Videos Watched'}, title=ACTIVITY_TITLES[unit])
+        if view is not None:
+            fig.update_xaxes(range=[view[0], view[1]])
+        return fig
+
+    def chart_weekly(self, filters, points, view=None):
+        """Videos watched per ISO week, plotted at each week's Monday so the chart can be zoomed by date"""
+        if view is not None:
+            # Whole weeks: from the Monday of the first visible week to the Sunday of the last
+            filters = zoomed_filters(filters, (view[0] - pd.Timedelta(days=view[0].weekday()),
+                                               view[1] + pd.Timedelta(days=6 - view[1].weekday())))
+        weekly_counts = self.queries.weekly_counts(filters)
+        if weekly_counts.empty:
+            return go.Figure()
+        mondays = pd.to_datetime(weekly_counts.index + "-1", format="%G-W%V-%u")
+        weekly_counts = downsample(weekly_counts.set_axis(mondays), points)
+        fig = px.line(x=weekly_counts.index, y=weekly_counts.values, render_mode=render_mode(len(weekly_counts)),
+                      labels={'x':'Week','y':'Videos Watched'}, title="Weekly Videos Watched")
+        fig.update_traces(hovertemplate="%{x|%G-W%V}<br>Videos Watched=%{y}<extra></extra>")
+        if view is not None:
+            fig.update_xaxes(range=[view[0], view[1]])
+        return fig
+
+    def chart_category_time(self, filters, points):
+        counts = self.queries.category_weekly(filters)
+        if counts.empty:
+            return go.Figure()
+        small_categories = counts.columns[(counts.sum()/counts.sum().sum())<OTHERS_SHARE]
+        if len(small_categories)>0:
+            counts['Others'] = counts[small_categories].sum(axis=1)
+            counts.drop(columns=small_categories, inplace=True)
+        counts = counts[counts.sum().sort_values(ascending=False).index]
+        fig = go.Figure()
+        for col in counts.columns:
+            trace = downsample(counts[col], points)
+            fig.add_trace(line_trace(trace.index, trace.values, mode='lines+markers', name=col))
+        fig.update_layout(title="Category Prevalence Over Time (Weekly)",
+                          xaxis_title="Week", yaxis_title="Videos Watched")
+        return fig
+
+    def chart_correlation(self, filters, points, mode='auto'):
+        daily_counts = self.queries.daily_counts(filters)
+        search_day = self.queries.daily_search_counts(filters)
+        if daily_counts.empty or search_day.empty:
+            return go.Figure()
+        df_corr = pd.concat([daily_counts, search_day], axis=1).fillna(0)
+        df_corr.columns = ['watch','search']
+        if mode == 'density' or (mode == 'auto' and len(df_corr) > DENSITY_POINTS):
+            return self.density_figure(df_corr['search'].to_numpy(), df_corr['watch'].to_numpy())
+        return px.scatter(df_corr, x='search', y='watch', render_mode=render_mode(len(df_corr)),
+                          labels={'search':'Searches per Day','watch':'Videos Watched per Day'},
+                          title="Search vs Watch Correlation")
+
+    @staticmethod
+    def density_figure(search, watch):
+        """Days binned by (searches, videos watched) on the server, so only the grid is sent"""
+        def edges(values):
+            # Whole-number bins while the counts are small, DENSITY_BINS equal bins beyond that
+            top = values.max()
+            return np.arange(-0.5, top + 1.5) if top < DENSITY_BINS else np.linspace(0, top, DENSITY_BINS + 1)
+        days, search_edges, watch_edges = np.histogram2d(search, watch, bins=(edges(search), edges(watch)))
+        fig = go.Figure(go.Heatmap(
+            x=(search_edges[:-1] + search_edges[1:]) / 2, y=(watch_edges[:-1] + watch_edges[1:]) / 2,
+            z=np.where(days.T > 0, days.T, np.nan), colorscale='Reds', colorbar={'title': 'Days'},
+            hovertemplate='Searches: %{x:.0f}<br>Videos: %{y:.0f}<br>Days: %{z}<extra></extra>'))
+        fig.update_layout(title="Search vs Watch Correlation (days per cell)",
+                          xaxis_title="Searches per Day", yaxis_title="Videos Watched per Day")
+        return fig
+
+    def refresh_data(self):
+        """Let open dashboard pages redraw from the DB on their next poll, keeping the current filters"""
+        self.data_version += 1
+
+    def reload_data(self):
+        """Drop the cached dataset, figures and pooled connections so the next page load reads the DB afresh"""
+        self.data_version += 1
+        self.dataset.invalidate()
+        self.queries.close()
+        self.figures.clear()
+        self._client_rollups = None
+        self.load_data()
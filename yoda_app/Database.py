@@ -1,33 +1,660 @@
 # Database.py
 import sqlite3
 import os
+import json
+import time
+import secrets
+import numpy as np
 import pandas as pd
+from BulkWriter import BulkWriter, tune_connection, BUSY_TIMEOUT_S, STATEMENT_CACHE
+from Partitions import PartitionStore
+from Config import TIMEZONE
+
+SCHEMA_VERSION = 8
+
+US_PER_DAY = 86_400_000_000
+
+CHUNK_ROWS = 100_000  # rows per chunk from the streaming readers
+# Watch columns the readers can return: (key column in watch_events, dimension lookup or None)
+WATCH_COLUMNS = {
+    "time": ("time_us", None),
+    "day": ("local_day", None),
+    "title": ("video_key", "SELECT video_key, title FROM videos"),
+    "channel_name": ("channel_key", "SELECT channel_key, channel_name FROM channels"),
+    "video_id": ("video_key", "SELECT video_key, video_id FROM videos"),
+    "category_id": ("category_key", "SELECT category_key, category_id FROM categories"),
+    "category_name": ("category_key", "SELECT category_key, category_name FROM categories"),
+}
+SEARCH_COLUMNS = ["id", "time", "day", "title", "category_guess"]
+
+def normalize_term(term):
+    return str(term).lower().strip()
 
 class Database:
-    def __init__(self, db_name="yt_history.db"):
+    def __init__(self, db_name="yt_history.db", timezone=TIMEZONE):
         self.db_name = db_name
+        self.timezone = timezone
+        self.partitions = PartitionStore(db_name)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE)
+        conn.create_function("normalize_term", 1, normalize_term, deterministic=True)
+        tune_connection(conn)
+        self.init_schema(conn)
+        return conn
+
+    def init_schema(self, conn):
+        """Create the star schema, migrating the flat watch_history / search_history tables of the
+        original overwrite-on-upload save (written by DataFrame.to_sql, user_version 0).
+
+        watch_events is the fact table: integer UTC epoch microseconds plus integer keys into the
+        channels, videos and categories dimensions; it lives in per-year partition files (see
+        Partitions.py). videos doubles as the metadata cache (fetched_at).
+        Both fact tables store time as epoch microseconds (time_us) and the event's date in the
+        configured time zone as days since 1970-01-01 (local_day); meta.timezone records that zone,
+        and the days are recomputed when it changes.
+        watch_daily and search_daily are count rollups by local day, kept in step with the facts on
+        every write; partitions.rolled_up_id marks how far each partition's events are counted in watch_daily.
+        meta.data_version is bumped by every transaction that changes stored history; meta.db_id is
+        random per database, so files stamped with a version (Snapshot.py) are not mistaken for a
+        new database's after the old one is deleted and its counter starts again.
+        videos_fts and search_fts are FTS5 indexes over video titles/descriptions and search terms,
+        indexed as rows are ingested; a trigger re-indexes videos whose title or description changes.
+        """
+        if (conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION
+                and self._stored_timezone(conn) == self.timezone):
+            return
+
+        # Take the write lock before looking, so a second connection waits and then sees the migrated schema
+        conn.execute("BEGIN IMMEDIATE")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            if self._stored_timezone(conn) != self.timezone:
+                self._assign_local_days(conn)
+                self.rebuild_rollups(conn)
+                self._bump_version(conn)
+            conn.commit()
+            return
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if not tables and self.partitions.years():
+            # Keys in partitions left behind by a deleted main DB would point at the wrong dimension rows
+            self.partitions.set_aside(f"orphan-{int(time.time())}")
+        legacy_watch = legacy_search = None
+        if "watch_history" in tables:
+            legacy_watch = pd.read_sql("SELECT * FROM watch_history", conn)
+            conn.execute("DROP TABLE watch_history")
+        if "search_history" in tables:
+            legacy_search = pd.read_sql("SELECT * FROM search_history", conn)
+            conn.execute("DROP TABLE search_history")
+
+        conn.execute("""CREATE TABLE IF NOT EXISTS channels (
+                            channel_key INTEGER PRIMARY KEY,
+                            channel_name TEXT NOT NULL UNIQUE
+                        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS categories (
+                            category_key INTEGER PRIMARY KEY,
+                            category_id TEXT NOT NULL UNIQUE,
+                            category_name TEXT
+                        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS videos (
+                            video_key INTEGER PRIMARY KEY,
+                            video_id TEXT NOT NULL UNIQUE,
+                            title TEXT,
+                            description TEXT,
+                            category_key INTEGER REFERENCES categories (category_key),
+                            fetched_at INTEGER
+                        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_fetched_at ON videos (fetched_at)")
+        conn.execute("""CREATE TABLE IF NOT EXISTS search_history (
+                            id INTEGER PRIMARY KEY,
+                            time_us INTEGER NOT NULL,
+                            local_day INTEGER NOT NULL,
+                            title TEXT NOT NULL,
+                            category_guess TEXT,
+                            UNIQUE (time_us, title)
+                        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS api_quota (
+                            day TEXT NOT NULL,
+                            job TEXT NOT NULL,
+                            units INTEGER NOT NULL,
+                            PRIMARY KEY (day, job)
+                        )""")
+        # Rollups: days are local days since the epoch; category_key 0 means not categorised yet
+        conn.execute("""CREATE TABLE IF NOT EXISTS watch_daily (
+                            day INTEGER NOT NULL,
+                            channel_key INTEGER NOT NULL,
+                            category_key INTEGER NOT NULL,
+                            n INTEGER NOT NULL,
+                            PRIMARY KEY (day, channel_key, category_key)
+                        ) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS search_daily (
+                            day INTEGER NOT NULL,
+                            term TEXT NOT NULL,
+                            n INTEGER NOT NULL,
+                            PRIMARY KEY (day, term)
+                        ) WITHOUT ROWID""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS partitions (
+                            year INTEGER PRIMARY KEY,
+                            rolled_up_id INTEGER NOT NULL
+                        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS meta (
+                            key TEXT PRIMARY KEY,
+                            value INTEGER NOT NULL
+                        )""")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('timezone', ?)", (self.timezone,))
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('db_id', ?)", (secrets.randbits(62),))
+        # External-content FTS5 tables: the text lives once, in videos / search_history
+        conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5 (
+                            title, description,
+                            content = 'videos', content_rowid = 'video_key', tokenize = 'unicode61 remove_diacritics 2'
+                        )""")
+        # New rows are indexed in bulk by the ingest (one INSERT ... SELECT instead of a trigger per row)
+        conn.execute("""CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF title, description ON videos BEGIN
+                            INSERT INTO videos_fts (videos_fts, rowid, title, description)
+                            VALUES ('delete', old.video_key, old.title, old.description);
+                            INSERT INTO videos_fts (rowid, title, description)
+                            VALUES (new.video_key, new.title, new.description);
+                        END""")
+        conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5 (
+                            title,
+                            content = 'search_history', content_rowid = 'id', tokenize = 'unicode61 remove_diacritics 2'
+                        )""")
+
+        if legacy_watch is not None:
+            legacy_watch["time"] = pd.to_datetime(legacy_watch["time"], utc=True, format="mixed")
+            self._write_events(self._add_dimensions(conn, legacy_watch))
+            # The original save kept metadata on every row; treat it as fetched now
+            fetched = legacy_watch.dropna(subset=["video_id", "category_id"]).drop_duplicates("video_id")
+            self._apply_metadata(conn, [
+                (r.video_id, r.category_id, r.category_name, r.title, r.video_description, int(time.time()))
+                for r in fetched.itertuples(index=False)
+            ])
+        if legacy_search is not None:
+            legacy_search["time"] = pd.to_datetime(legacy_search["time"], utc=True, format="mixed")
+            self._insert_search(conn, legacy_search)
+        if legacy_watch is not None or legacy_search is not None:
+            self._catch_up_rollups(conn)
+            self._bump_version(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        if legacy_watch is not None:
+            conn.execute("VACUUM")  # give back the pages of the flat table
+
+    @staticmethod
+    def to_epoch_us(series):
+        return pd.to_datetime(series, utc=True).dt.as_unit("us").astype("int64")
+
+    def local_days(self, time_us):
+        """Days since 1970-01-01 of each epoch-microsecond timestamp's date in the configured time zone"""
+        local = pd.to_datetime(pd.Series(time_us, dtype="int64"), unit="us", utc=True).dt.tz_convert(self.timezone)
+        return (local.dt.tz_localize(None) - pd.Timestamp(0)).dt.days.to_numpy()
+
+    def day_start_us(self, date):
+        """Epoch microseconds of local midnight at the start of `date`"""
+        start = pd.Timestamp(date).normalize().tz_localize(self.timezone, ambiguous=False, nonexistent="shift_forward")
+        return start.value // 1000
+
+    @staticmethod
+    def _stored_timezone(conn):
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'timezone'").fetchone()
+        except sqlite3.OperationalError:  # no meta table yet
+            return None
+        return row[0] if row else None
+
+    def _assign_local_days(self, conn):
+        """Recompute local_day on every fact row for the configured zone"""
+        def assign(db, table):
+            rows = db.execute(f"SELECT id, time_us FROM {table}").fetchall()
+            if rows:
+                ids, time_us = zip(*rows)
+                db.executemany(f"UPDATE {table} SET local_day = ? WHERE id = ?",
+                               zip(self.local_days(time_us).tolist(), ids))
+
+        def assign_partition(part, _):
+            with part:
+                assign(part, "watch_events")
+
+        assign(conn, "search_history")
+        self.partitions.map(assign_partition, self.partitions.years())
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'timezone'", (self.timezone,))
+
+    @staticmethod
+    def _keys(values, key_map):
+        """Map labels to integer keys, with None (SQL NULL) where there is no key"""
+        if not key_map:
+            return [None] * len(values)
+        codes = pd.Categorical(values, categories=pd.Index(list(key_map), dtype=object)).codes
+        keys = np.array(list(key_map.values()), dtype=object)
+        return np.where(codes >= 0, keys[codes], None).tolist()
+
+    @staticmethod
+    def watch_counts(conn, where="1", params=()):
+        """(day, channel_key, category_key, n) counts of one partition's events; category 0 = uncategorised"""
+        return conn.execute(f"""SELECT local_day, channel_key, COALESCE(category_key, 0), COUNT(*)
+                                FROM watch_events WHERE {where}
+                                GROUP BY 1, 2, 3""", params).fetchall()
+
+    @staticmethod
+    def _add_watch_counts(conn, counts, sign=1):
+        """Add (sign=1) or remove (sign=-1) watch_counts rows in watch_daily"""
+        BulkWriter(conn).write(
+            """INSERT INTO watch_daily (day, channel_key, category_key, n) VALUES (?, ?, ?, ?)
+               ON CONFLICT (day, channel_key, category_key) DO UPDATE SET n = n + excluded.n""",
+            ((day, channel, category, sign * n) for day, channel, category, n in counts)
+        )
+
+    @staticmethod
+    def _rollup_search(conn, where, params=()):
+        conn.execute(f"""INSERT INTO search_daily (day, term, n)
+                         SELECT local_day, normalize_term(title), COUNT(*)
+                         FROM search_history WHERE {where}
+                         GROUP BY 1, 2
+                         ON CONFLICT (day, term) DO UPDATE SET n = n + excluded.n""", params)
+
+    def _catch_up_rollups(self, conn, full=False):
+        """Count partition events past each partition's rolled_up_id mark (all of them if `full`) into watch_daily.
+
+        Partitions commit separately from the main file, so the marks rather than the insert itself
+        decide what is counted: events committed by an interrupted save are picked up by the next one.
+        The caller holds the main write lock. Returns the new marks as {year: last counted id}.
+        """
+        marks = {} if full else dict(conn.execute("SELECT year, rolled_up_id FROM partitions").fetchall())
+
+        def pending(part, year):
+            part.execute("BEGIN")  # the max id and the counts come from the same snapshot
+            try:
+                last = part.execute("SELECT COALESCE(MAX(id), 0) FROM watch_events").fetchone()[0]
+                return last, self.watch_counts(part, "id > ? AND id <= ?", (marks.get(year, 0), last))
+            finally:
+                part.rollback()
+
+        years = self.partitions.years()
+        counted = {}
+        for year, (last, counts) in zip(years, self.partitions.map(pending, years)):
+            self._add_watch_counts(conn, counts)
+            conn.execute("""INSERT INTO partitions (year, rolled_up_id) VALUES (?, ?)
+                            ON CONFLICT (year) DO UPDATE SET rolled_up_id = excluded.rolled_up_id""", (year, last))
+            counted[year] = last
+        return counted
+
+    def rebuild_rollups(self, conn):
+        """Recompute both rollups from the facts"""
+        conn.execute("DELETE FROM watch_daily")
+        conn.execute("DELETE FROM search_daily")
+        self._catch_up_rollups(conn, full=True)
+        self._rollup_search(conn, "1")
+
+    def _add_dimensions(self, conn, watch_df):
+        """Add new channels/videos and return the events as (time_us, channel_key, video_key, category_key) rows"""
+        writer = BulkWriter(conn)
+        watch_df = watch_df.dropna(subset=["time", "channel_name"])
+        writer.write("INSERT OR IGNORE INTO channels (channel_name) VALUES (?)",
+                     ((c,) for c in watch_df["channel_name"].unique()))
+        # Sorted input appends to the UNIQUE index instead of splitting pages all over it
+        videos = watch_df.dropna(subset=["video_id"]).drop_duplicates("video_id").sort_values("video_id")
+        stored = conn.execute("SELECT COALESCE(MAX(video_key), 0) FROM videos").fetchone()[0]
+        writer.write("INSERT OR IGNORE INTO videos (video_id, title) VALUES (?, ?)",
+                     zip(videos["video_id"], videos["title"]))
+        conn.execute("""INSERT INTO videos_fts (rowid, title, description)
+                        SELECT video_key, title, description FROM videos WHERE video_key > ?""", (stored,))
+
+        channel_keys = dict(conn.execute("SELECT channel_name, channel_key FROM channels").fetchall())
+        video_rows = conn.execute("SELECT video_id, video_key, category_key FROM videos").fetchall()
+        video_keys = {vid: key for vid, key, _ in video_rows}
+        # Videos fetched on an earlier upload carry their category straight from the dimension
+        video_categories = {vid: cat for vid, _, cat in video_rows}
+
+        return pd.DataFrame({
+            "time_us": self.to_epoch_us(watch_df["time"]).tolist(),
+            "channel_key": self._keys(watch_df["channel_name"], channel_keys),
+            "video_key": self._keys(watch_df["video_id"], video_keys),
+            "category_key": self._keys(watch_df["video_id"], video_categories),
+        }, dtype=object)
+
+    def _write_events(self, events):
+        """Insert events not stored yet into their year partitions, each in its own transaction; returns rows added"""
+        if events.empty:
+            return 0
+        events = events.sort_values("time_us")
+        events["local_day"] = self.local_days(events["time_us"]).tolist()
+        years = self.partitions.years_of(events["time_us"])
+
+        def write(part, year):
+            rows = events[years == year]
+            writer = BulkWriter(part)
+            with part:
+                stored = part.execute("SELECT COALESCE(MAX(id), 0) FROM watch_events").fetchone()[0]
+                with writer.deferred_indexes("watch_events", enabled=len(rows) > stored):
+                    return writer.write(
+                        """INSERT INTO watch_events (time_us, channel_key, video_key, category_key, local_day)
+                           VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT (time_us, channel_key) DO NOTHING""",
+                        zip(*(rows[c].tolist() for c in
+                              ["time_us", "channel_key", "video_key", "category_key", "local_day"]))
+                    )
+        return sum(self.partitions.map(write, sorted(set(years.tolist()))))
+
+    def _insert_search(self, conn, search_df):
+        search_df = search_df.dropna(subset=["time", "title"])
+        stored = conn.execute("SELECT COALESCE(MAX(id), 0) FROM search_history").fetchone()[0]
+        time_us = self.to_epoch_us(search_df["time"])
+        added = BulkWriter(conn).write(
+            """INSERT INTO search_history (time_us, local_day, title, category_guess) VALUES (?, ?, ?, ?)
+               ON CONFLICT (time_us, title) DO NOTHING""",
+            zip(time_us.tolist(), self.local_days(time_us).tolist(), search_df["title"], search_df["category_guess"])
+        )
+        self._rollup_search(conn, "id > ?", (stored,))
+        conn.execute("INSERT INTO search_fts (rowid, title) SELECT id, title FROM search_history WHERE id > ?", (stored,))
+        return added
+
+    def _apply_metadata(self, conn, rows):
+        """rows: (video_id, category_id, category_name, title, description, fetched_at); None keeps stored values"""
+        writer = BulkWriter(conn)
+        writer.write(
+            """INSERT INTO categories (category_id, category_name) VALUES (?, ?)
+               ON CONFLICT (category_id) DO UPDATE SET category_name = COALESCE(excluded.category_name, category_name)""",
+            list({(r[1], r[2]) for r in rows if pd.notna(r[1])})
+        )
+        writer.write(
+            """UPDATE videos
+               SET category_key = COALESCE((SELECT category_key FROM categories WHERE category_id = ?), category_key),
+                   title = COALESCE(?, title), description = COALESCE(?, description), fetched_at = ?
+               WHERE video_id = ?""",
+            [(category_id, title, description, fetched_at, video_id)
+             for video_id, category_id, _, title, description, fetched_at in rows]
+        )
+        # Keep the denormalised category key on the facts, and the rollup counts, in step with the videos
+        video_ids = [r[0] for r in rows]
+        new_keys = conn.execute(
+            "SELECT video_key, category_key FROM videos WHERE video_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(video_ids),)
+        ).fetchall()
+        batch_keys = json.dumps([key for key, _ in new_keys])
+        counted = self._catch_up_rollups(conn)
+
+        def rekey(part, year):
+            # Only events already in watch_daily move between categories; ones a concurrent save commits
+            # past the mark are re-keyed too, and the next catch-up counts them under their new category
+            in_rollup = ("video_key IN (SELECT value FROM json_each(?)) AND id <= ?", (batch_keys, counted.get(year, 0)))
+            with part:
+                before = self.watch_counts(part, *in_rollup)
+                part.executemany("UPDATE watch_events SET category_key = ? WHERE video_key = ?",
+                                 [(category, key) for key, category in new_keys])
+                after = self.watch_counts(part, *in_rollup)
+            return before, after
+
+        days = set()
+        for before, after in self.partitions.map(rekey, self.partitions.years()):
+            self._add_watch_counts(conn, before, sign=-1)
+            self._add_watch_counts(conn, after)
+            days.update(day for day, *_ in before)
+        conn.execute("DELETE FROM watch_daily WHERE n = 0 AND day IN (SELECT value FROM json_each(?))",
+                     (json.dumps(sorted(days)),))
+
+    @staticmethod
+    def _bump_version(conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+
+    @staticmethod
+    def _read_version(conn):
+        return conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()[0]
+
+    def data_version(self):
+        """Counter that changes whenever stored history changes; None if there is no DB yet"""
+        if not os.path.exists(self.db_name):
+            return None
+        conn = self.connect()
+        version = self._read_version(conn)
+        conn.close()
+        return version
+
+    @staticmethod
+    def read_stamp(conn):
+        """(db_id, data_version): identifies the stored history across databases, not just within one"""
+        return tuple(dict(conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('db_id', 'data_version')").fetchall()).get(k)
+            for k in ("db_id", "data_version"))
+
+    def stamp(self):
+        """read_stamp on a fresh connection; None if there is no DB yet"""
+        if not os.path.exists(self.db_name):
+            return None
+        conn = self.connect()
+        try:
+            return self.read_stamp(conn)
+        finally:
+            conn.close()
 
     def save_to_database(self, watch_df, search_df):
-        if os.path.exists(self.db_name):
-            os.remove(self.db_name)
-        conn = sqlite3.connect(self.db_name)
-        watch_df.to_sql("watch_history", conn, index=False)
-        search_df.to_sql("search_history", conn, index=False)
+        """Insert only events that are not stored yet; overlapping uploads leave existing rows untouched"""
+        conn = self.connect()
+        # Dimension keys are committed before any partition row refers to them
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            events = self._add_dimensions(conn, watch_df)
+        new_watch = self._write_events(events)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._catch_up_rollups(conn)
+            new_search = self._insert_search(conn, search_df)
+            if new_watch or new_search:
+                self._bump_version(conn)
         conn.close()
-        print(f"\nSaved data to database '{self.db_name}' (overwrite mode)")
+        print(f"\nSaved {new_watch} new watch and {new_search} new search events to database '{self.db_name}'")
+        return new_watch, new_search
 
-    def load_watch_search(self):
-        """Load both watch_history and search_history as DataFrames"""
+    def update_video_metadata(self, meta_df, video_ids):
+        """Store fetched metadata for the requested ids and re-key their watch events in place"""
         if not os.path.exists(self.db_name):
-            return pd.DataFrame(), pd.DataFrame()  # empty if DB doesn't exist
-        conn = sqlite3.connect(self.db_name)
+            return 0
+        fetched_at = int(time.time())
+        found = {
+            r.video_id: (r.category_id, r.category_name, r.video_title, r.video_description)
+            for r in meta_df.itertuples(index=False)
+        }
+        # Ids the API no longer returns are still stamped so they are not requested again straight away
+        rows = [(vid, *found.get(vid, (None, None, None, None)), fetched_at) for vid in video_ids]
+        conn = self.connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # one re-keying job at a time, or rollup deltas could interleave
+            self._apply_metadata(conn, rows)
+            self._bump_version(conn)
+        conn.close()
+        return len(found)
+
+    def uncached_video_ids(self):
+        """Return the stored watch video ids that have never been fetched"""
+        if not os.path.exists(self.db_name):
+            return []
+        conn = self.connect()
+        rows = conn.execute("SELECT video_id FROM videos WHERE fetched_at IS NULL").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def stale_video_ids(self, max_age_days, limit=50):
+        """Return up to `limit` fetched ids older than `max_age_days`, oldest fetch first"""
+        if not os.path.exists(self.db_name):
+            return []
+        cutoff = int(time.time()) - max_age_days * 86400
+        conn = self.connect()
+        rows = conn.execute(
+            "SELECT video_id FROM videos WHERE fetched_at < ? ORDER BY fetched_at LIMIT ?",
+            (cutoff, limit)
+        ).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def quota_used(self, job):
+        """API units spent by `job` today (quota resets daily)"""
+        if not os.path.exists(self.db_name):
+            return 0
+        conn = self.connect()
+        row = conn.execute("SELECT units FROM api_quota WHERE day = date('now') AND job = ?", (job,)).fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    def add_quota_use(self, job, units=1):
+        conn = self.connect()
+        with conn:
+            conn.execute("""INSERT INTO api_quota (day, job, units) VALUES (date('now'), ?, ?)
+                            ON CONFLICT (day, job) DO UPDATE SET units = units + excluded.units""",
+                         (job, units))
+        conn.close()
+
+    @staticmethod
+    def _dimension(conn, dim_sql):
+        """(lookup, labels) for a (key, label) dimension query: lookup[key] is the label's code"""
+        dim = conn.execute(dim_sql).fetchall()
+        dim_keys = np.array([k for k, _ in dim], dtype="int64")
+        codes, labels = pd.factorize(pd.Series([label for _, label in dim], dtype=object))
+        # One spare slot at the end stays -1, so NULL keys (mapped to index -1) decode to NaN
+        lookup = np.full(int(dim_keys.max()) + 2 if len(dim_keys) else 1, -1, dtype="int64")
+        lookup[dim_keys] = codes
+        return lookup, labels
+
+    @staticmethod
+    def _decode(keys, dimension):
+        lookup, labels = dimension
+        keys = np.where(keys < len(lookup) - 1, keys, -1)  # keys added after the lookup was read decode to NaN
+        return pd.Categorical.from_codes(lookup[keys], categories=labels)
+
+    def _time_range(self, start_date, end_date):
+        """(clauses, params, start_us, end_us) selecting an inclusive range of local dates by time_us;
+        None is open-ended"""
+        start_us = self.day_start_us(start_date) if start_date else None
+        end_us = self.day_start_us(pd.Timestamp(end_date) + pd.Timedelta(days=1)) if end_date else None
+        clauses, params = [], []
+        if start_us is not None:
+            clauses.append("time_us >= ?")
+            params.append(start_us)
+        if end_us is not None:
+            clauses.append("time_us < ?")
+            params.append(end_us)
+        return clauses, params, start_us, end_us
+
+    @classmethod
+    def read_rollups(cls, conn):
+        """(data_version, watch, search) from one read transaction on `conn`.
+
+        watch is watch_daily as day / channel_name / category_name / n, with the labels as categoricals
+        (NaN where the videos are not categorised yet); search is search_daily as day / term / n.
+        Both are sorted by day (the order of their primary keys, so sorting costs nothing).
+        """
+        conn.execute("BEGIN")
         try:
-            watch_df = pd.read_sql("SELECT * FROM watch_history", conn, parse_dates=["time"])
-        except Exception:
-            watch_df = pd.DataFrame()
+            version = cls._read_version(conn)
+            watch = np.array(conn.execute("SELECT day, channel_key, category_key, n FROM watch_daily ORDER BY day").fetchall(),
+                             dtype="int64").reshape(-1, 4)
+            search = conn.execute("SELECT day, term, n FROM search_daily ORDER BY day").fetchall()
+            channels = cls._dimension(conn, WATCH_COLUMNS["channel_name"][1])
+            categories = cls._dimension(conn, WATCH_COLUMNS["category_name"][1])
+        finally:
+            conn.rollback()
+        watch_df = pd.DataFrame({
+            "day": watch[:, 0],
+            "channel_name": cls._decode(watch[:, 1], channels),
+            "category_name": cls._decode(watch[:, 2], categories),
+            "n": watch[:, 3],
+        })
+        search_df = pd.DataFrame({
+            "day": np.array([r[0] for r in search], dtype="int64"),
+            "term": pd.Categorical([r[1] for r in search]),
+            "n": np.array([r[2] for r in search], dtype="int64"),
+        })
+        return version, watch_df, search_df
+
+    def iter_watch(self, columns=None, start_date=None, end_date=None, channel=None, category=None,
+                   chunk_rows=CHUNK_ROWS):
+        """Stream watch history as DataFrames of at most `chunk_rows` rows, one partition after another.
+
+        Only the requested columns are read and decoded (dimension labels come back as categoricals,
+        day as the integer local day). The date range (inclusive, dates in the configured zone) becomes
+        a time_us range scan that also skips whole partitions; it and the channel/category filters
+        are evaluated by SQLite. Fetched keys land in one buffer reused for every chunk, so
+        memory stays flat however long the history is.
+        """
+        columns = list(columns or WATCH_COLUMNS)
+        if not os.path.exists(self.db_name):
+            return
+        clauses, params, start_us, end_us = self._time_range(start_date, end_date)
+        conn = self.connect()
         try:
-            search_df = pd.read_sql("SELECT * FROM search_history", conn, parse_dates=["time"])
-        except Exception:
-            search_df = pd.DataFrame()
-        conn.close()
+            if channel:
+                clauses.append("channel_key IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps([r[0] for r in conn.execute(
+                    "SELECT channel_key FROM channels WHERE channel_name = ?", (channel,))]))
+            if category:
+                clauses.append("category_key IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps([r[0] for r in conn.execute(
+                    "SELECT category_key FROM categories WHERE category_name = ?", (category,))]))
+            dimensions = {c: self._dimension(conn, WATCH_COLUMNS[c][1]) for c in columns if WATCH_COLUMNS[c][1]}
+        finally:
+            conn.close()
+
+        keys = list(dict.fromkeys(WATCH_COLUMNS[c][0] for c in columns))
+        sql = (f"SELECT {', '.join(f'COALESCE({k}, -1)' for k in keys)} FROM watch_events"
+               + (" WHERE " + " AND ".join(clauses) if clauses else ""))
+        buffer = np.empty((chunk_rows, len(keys)), dtype="int64")
+        years = self.partitions.years_between(
+            start_us // US_PER_DAY if start_us is not None else None,
+            (end_us - 1) // US_PER_DAY if end_us is not None else None)
+        for year in years:
+            part = self.partitions.connect(year, readonly=True)
+            try:
+                cursor = part.execute(sql, params)
+                while rows := cursor.fetchmany(chunk_rows):
+                    chunk = buffer[:len(rows)]
+                    chunk[:] = rows
+                    data = {}
+                    for c in columns:
+                        key_column = chunk[:, keys.index(WATCH_COLUMNS[c][0])]
+                        if c == "time":
+                            data[c] = pd.to_datetime(key_column, unit="us", utc=True)
+                        elif c in dimensions:
+                            data[c] = self._decode(key_column, dimensions[c])
+                        else:
+                            data[c] = key_column.copy()  # the buffer is overwritten by the next chunk
+                    yield pd.DataFrame(data)
+            finally:
+                part.close()
+
+    def iter_search(self, columns=None, start_date=None, end_date=None, chunk_rows=CHUNK_ROWS):
+        """Stream search history as DataFrames of at most `chunk_rows` rows (see iter_watch)"""
+        columns = list(columns or SEARCH_COLUMNS)
+        if not os.path.exists(self.db_name):
+            return
+        clauses, params, _, _ = self._time_range(start_date, end_date)
+        stored = {"time": "time_us", "day": "local_day"}
+        conn = self.connect()
+        try:
+            cursor = conn.execute(f"SELECT {', '.join(stored.get(c, c) for c in columns)} FROM search_history"
+                                  + (" WHERE " + " AND ".join(clauses) if clauses else ""), params)
+            while rows := cursor.fetchmany(chunk_rows):
+                chunk = pd.DataFrame.from_records(rows, columns=columns)
+                if "time" in chunk:
+                    chunk["time"] = pd.to_datetime(chunk["time"].to_numpy(dtype="int64"), unit="us", utc=True)
+                yield chunk
+        finally:
+            conn.close()
+
+    def search_labels(self, column):
+        """Distinct non-null values of a search_history text column, sorted; one dictionary for every chunk"""
+        if not os.path.exists(self.db_name):
+            return []
+        conn = self.connect()
+        try:
+            return [r[0] for r in conn.execute(
+                f"SELECT DISTINCT {column} FROM search_history WHERE {column} IS NOT NULL ORDER BY 1")]
+        finally:
+            conn.close()
+
+    def load_watch_search(self):
+        """Load both watch and search history as DataFrames; watch dimensions come back as categoricals"""
+        if not os.path.exists(self.db_name):
+            return pd.DataFrame(), pd.DataFrame()  # empty if DB doesn't exist
+        watch_chunks, search_chunks = list(self.iter_watch()), list(self.iter_search())
+        watch_df = pd.concat(watch_chunks, ignore_index=True) if watch_chunks else pd.DataFrame(columns=list(WATCH_COLUMNS))
+        search_df = pd.concat(search_chunks, ignore_index=True) if search_chunks else pd.DataFrame(columns=SEARCH_COLUMNS)
         return watch_df, search_df
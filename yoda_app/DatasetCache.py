@@ -0,0 +1,68 @@
+# DatasetCache.py
+import os
+import threading
+from collections import namedtuple
+from Database import Database
+from ConnectionPool import ReadConnectionPool
+from Snapshot import RollupSnapshot
+
+# The daily rollups as frames (see Database.read_rollups) plus the dashboard's filter choices
+HistoryDataset = namedtuple("HistoryDataset", ["db_id", "version", "watch", "search", "channels", "categories"])
+
+class DatasetCache:
+    """The dashboard's working set, held in memory once per process and per DB.
+
+    The rollups are read and decoded once per data version; until an ingest or metadata update
+    bumps meta.data_version (or reload_data invalidates it), every filter change and page load
+    reuses the same frames and only pays for filtering and aggregating them. With pyarrow installed
+    a loaded version is also kept in a RollupSnapshot, which other processes on the same DB load
+    instead of querying SQLite again.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.pool = ReadConnectionPool(db_name)
+        self.snapshot = RollupSnapshot(db_name)
+        self._lock = threading.Lock()
+        self._dataset = None
+
+    @classmethod
+    def shared(cls, db_name):
+        """The process-wide cache for `db_name`"""
+        with cls._shared_lock:
+            if db_name not in cls._shared:
+                cls._shared[db_name] = cls(db_name)
+            return cls._shared[db_name]
+
+    def get(self):
+        """The dataset at the DB's current data version; None if there is no DB yet"""
+        if not os.path.exists(self.db_name):
+            return None
+        with self.pool.connection() as conn:
+            db_id, version = Database.read_stamp(conn)
+        # One thread loads a new version; the others wait for it rather than loading it too
+        with self._lock:
+            if self._dataset is None or (self._dataset.db_id, self._dataset.version) != (db_id, version):
+                self._dataset = self._load(db_id, version)
+            return self._dataset
+
+    def invalidate(self):
+        with self._lock:
+            self._dataset = None
+        self.pool.close()
+
+    def _load(self, db_id, version):
+        rollups = self.snapshot.load((db_id, version))
+        if rollups is not None:
+            watch, search = rollups
+        else:
+            with self.pool.connection() as conn:
+                version, watch, search = Database.read_rollups(conn)
+            self.snapshot.write((db_id, version), watch, search)
+        return HistoryDataset(
+            db_id, version, watch, search,
+            sorted(watch["channel_name"].cat.categories),
+            sorted(watch["category_name"].cat.categories),
+        )
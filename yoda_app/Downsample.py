@@ -0,0 +1,40 @@
+# Downsample.py
+import numpy as np
+import pandas as pd
+
+def lttb(x, y, n_out):
+    """Indices of at most `n_out` points that keep the visual shape of the series (x ascending).
+
+    Largest-Triangle-Three-Buckets: the first and last points are kept, the rest is cut into
+    n_out - 2 equal buckets, and each bucket keeps the point forming the largest triangle with the
+    point kept from the previous bucket and the average of the next one. Each bucket is evaluated
+    as one numpy expression, so the Python loop runs once per output point rather than per input point.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype("int64")
+    # Bucket means, used as the third vertex by the bucket before
+    sums_x, sums_y = np.add.reduceat(x[:-1], edges[:-1]), np.add.reduceat(y[:-1], edges[:-1])
+    sizes = np.diff(edges)
+    mean_x, mean_y = sums_x / sizes, sums_y / sizes
+    kept = np.empty(n_out, dtype="int64")
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = (mean_x[i + 1], mean_y[i + 1]) if i + 1 < len(mean_x) else (x[-1], y[-1])
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+def downsample(series, n_out):
+    """`series` (ascending index of dates or labels) cut down to at most `n_out` points with lttb"""
+    if len(series) <= n_out:
+        return series
+    x = (series.index.to_numpy().astype("int64") if pd.api.types.is_datetime64_any_dtype(series.index)
+         else np.arange(len(series)))
+    return series.iloc[lttb(x, series.to_numpy(), n_out)]
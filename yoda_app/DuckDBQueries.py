@@ -0,0 +1,183 @@
+# DuckDBQueries.py
+import threading
+from contextlib import contextmanager
+import duckdb
+import pyarrow as pa
+import pandas as pd
+from Database import Database, normalize_term
+from Queries import HistoryQueries, day_to_date, day_bounds, week_labels, week_category_table
+from Snapshot import HistorySnapshot
+
+WEEK = "((day + 3) // 7)"  # Monday-based, as in Queries (DuckDB's / is true division)
+
+class DuckDBQueries:
+    """HistoryQueries over the Arrow snapshot, aggregated by DuckDB's vectorised engine.
+
+    The snapshot is memory-mapped and handed to DuckDB without copying; it is reloaded (and rewritten
+    first if needed) whenever the DB's stamp (id and data version) moves. Text filters still resolve
+    through the SQLite FTS5 index, and the matching ids are joined in as a small Arrow table.
+    """
+    def __init__(self, db_name):
+        self.db = Database(db_name)
+        self.snapshot = HistorySnapshot(db_name)
+        self.sqlite = HistoryQueries(db_name)
+        self.con = duckdb.connect()
+        # Search terms fold exactly as at ingest (search_daily); DuckDB's lower/trim differ on Unicode
+        # case and on whitespace other than spaces. NULLs go through too, as SQLite passes them.
+        self.con.create_function("normalize_term", normalize_term, ["VARCHAR"], "VARCHAR", null_handling="special")
+        self._lock = threading.Lock()
+        self._loaded = (None, None, None)  # (stamp, watch table, search table)
+        self._local = threading.local()
+
+    @contextmanager
+    def pinned(self):
+        """Answer every query in the block from the same loaded snapshot (see HistoryQueries.pinned)"""
+        if getattr(self._local, "tables", None) is not None:
+            yield
+            return
+        with self.sqlite.pinned():
+            self._local.tables = self._tables()
+            try:
+                yield
+            finally:
+                self._local.tables = None
+
+    def _tables(self):
+        stamp = self.sqlite.stamp()
+        with self._lock:
+            if stamp is not None and self._loaded[0] != stamp:
+                watch = self.snapshot.load_table("watch", version=stamp[1])
+                search = self.snapshot.load_table("search", version=stamp[1])
+                if watch is None or search is None:
+                    version = self.snapshot.write()
+                    watch = self.snapshot.load_table("watch", version=version)
+                    search = self.snapshot.load_table("search", version=version)
+                self._loaded = (stamp, watch, search)
+            return self._loaded[1:]
+
+    def close(self):
+        """Drop the pooled connections and the loaded snapshot"""
+        self.sqlite.close()
+        with self._lock:
+            self._loaded = (None, None, None)
+
+    def _rows(self, sql, params=(), matches=None):
+        watch, search = getattr(self._local, "tables", None) or self._tables()
+        if watch is None:
+            return []
+        # One cursor per call: DuckDB connections must not be shared across Dash worker threads
+        cur = self.con.cursor()
+        try:
+            cur.register("watch", watch)
+            cur.register("search", search)
+            if matches is not None:
+                cur.register("matched_videos", pa.table({"video_id": pa.array(matches[0], type=pa.string())}))
+                cur.register("matched_searches", pa.table({"id": pa.array(matches[1], type=pa.int64())}))
+            return cur.execute(sql, list(params)).fetchall()
+        finally:
+            cur.close()
+
+    def _matches(self, filters):
+        return self.sqlite.text_matches(filters.text) if filters.text else None
+
+    def _watch_from(self, filters, extra=()):
+        """Watch events with their local day, filtered"""
+        clauses, params = day_bounds(filters)
+        if filters.channel:
+            clauses.append("channel_name = ?")
+            params.append(filters.channel)
+        if filters.category:
+            clauses.append("category_name = ?")
+            params.append(filters.category)
+        if filters.text:
+            clauses.append("video_id IN (SELECT video_id FROM matched_videos)")
+        clauses.extend(extra)
+        source = "(SELECT day, channel_name, category_name, video_id FROM watch)"
+        return source + (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _search_from(self, filters):
+        """Searches with their local day and the normalised term, filtered by date and text"""
+        clauses, params = day_bounds(filters)
+        if filters.text:
+            clauses.append("id IN (SELECT id FROM matched_searches)")
+        source = "(SELECT id, day, normalize_term(title::VARCHAR) AS term FROM search)"
+        return source + (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    @staticmethod
+    def _series(rows):
+        return pd.Series([r[1] for r in rows], index=[r[0] for r in rows], dtype="int64")
+
+    # --- Dataset summary ---
+    def stamp(self):
+        return self.sqlite.stamp()
+
+    def has_data(self):
+        rows = self._rows("SELECT (SELECT COUNT(*) FROM watch) + (SELECT COUNT(*) FROM search)")
+        return bool(rows and rows[0][0])
+
+    def date_range(self):
+        rows = self._rows("SELECT MIN(day), MAX(day) FROM watch")
+        if not rows or rows[0][0] is None:
+            return None, None
+        first, last = day_to_date(rows[0])
+        return first.date(), last.date()
+
+    def channels(self):
+        return self.sqlite.channels()
+
+    def categories(self):
+        return self.sqlite.categories()
+
+    # --- Chart aggregates ---
+    def top_channels(self, filters, n=10):
+        source, params = self._watch_from(filters)
+        return self._series(self._rows(
+            f"SELECT channel_name::VARCHAR, COUNT(*) AS n FROM {source} GROUP BY 1 ORDER BY n DESC LIMIT ?",
+            params + [n], self._matches(filters)))
+
+    def top_searches(self, filters, n=10):
+        source, params = self._search_from(filters)
+        return self._series(self._rows(
+            f"SELECT term, COUNT(*) AS n FROM {source} GROUP BY term ORDER BY n DESC LIMIT ?",
+            params + [n], self._matches(filters)))
+
+    def category_counts(self, filters):
+        source, params = self._watch_from(filters, ["category_name IS NOT NULL"])
+        return self._series(self._rows(
+            f"SELECT category_name::VARCHAR, COUNT(*) AS n FROM {source} GROUP BY 1 ORDER BY n DESC",
+            params, self._matches(filters)))
+
+    def daily_counts(self, filters):
+        source, params = self._watch_from(filters)
+        counts = self._series(self._rows(
+            f"SELECT day, COUNT(*) FROM {source} GROUP BY day ORDER BY day", params, self._matches(filters)))
+        counts.index = day_to_date(counts.index)
+        return counts
+
+    def daily_search_counts(self, filters):
+        source, params = self._search_from(filters)
+        counts = self._series(self._rows(
+            f"SELECT day, COUNT(*) FROM {source} GROUP BY day ORDER BY day", params, self._matches(filters)))
+        counts.index = day_to_date(counts.index)
+        return counts
+
+    def hourly_counts(self, filters):
+        return self.sqlite.hourly_counts(filters)
+
+    def weekly_counts(self, filters):
+        """Counts per ISO week, labelled 'YYYY-Www'"""
+        source, params = self._watch_from(filters)
+        rows = self._rows(
+            f"SELECT {WEEK} AS week, COUNT(*) FROM {source} GROUP BY week ORDER BY week",
+            params, self._matches(filters))
+        return pd.Series([r[1] for r in rows], index=week_labels([r[0] for r in rows]), dtype="int64")
+
+    def category_weekly(self, filters):
+        """Week (ending Sunday) x category counts"""
+        source, params = self._watch_from(filters, ["category_name IS NOT NULL"])
+        rows = self._rows(
+            f"SELECT {WEEK} AS week, category_name::VARCHAR, COUNT(*) AS n FROM {source} GROUP BY 1, 2",
+            params, self._matches(filters))
+        if not rows:
+            return pd.DataFrame()
+        return week_category_table(*zip(*rows))
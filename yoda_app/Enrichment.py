@@ -0,0 +1,154 @@
+# Enrichment.py
+import threading
+from YT_api import YouTubeAPI
+from Database import Database
+from Snapshot import HistorySnapshot
+from Config import QUERY_BACKEND
+
+def refresh_snapshot(db_name):
+    """Bring the Arrow snapshot up to date after a write, if the configured backend reads it (only DuckDB does)"""
+    if QUERY_BACKEND == "duckdb":
+        HistorySnapshot(db_name).refresh()
+
+class BackgroundEnricher:
+    """Fetch video metadata off the GUI thread and write it into the stored watch rows batch by batch"""
+    def __init__(self, api_key, db_name, on_batch=None, on_done=None):
+        self.api_key = api_key
+        self.db_name = db_name
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._finished = False
+        self._successor = None
+        self._predecessor = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the worker to finish after its current batch"""
+        self._stop.set()
+
+    def replace_with(self, job):
+        """Stop after the current batch and start `job` once this one has finished.
+
+        Nothing waits here: the batch in flight may sit in an API request for a long time, so the
+        caller (the GUI thread) never joins the worker; the worker starts its successor itself.
+        """
+        job._predecessor = self
+        with self._lock:
+            finished = self._finished
+            if not finished:
+                self._successor = job
+        self._stop.set()
+        if finished:
+            job.start()
+
+    def is_running(self):
+        """True from start until the job ends, including while it waits for the job it replaces"""
+        if self._thread is not None:
+            return self._thread.is_alive()
+        return self._predecessor is not None and self._predecessor.is_running()
+
+    def run(self):
+        try:
+            self._enrich()
+        except Exception as e:
+            print(f"[Enrichment] Enrichment failed: {e}")
+        finally:
+            with self._lock:
+                self._finished = True
+                successor = self._successor
+            if successor is not None:
+                # The successor reports completion instead; it starts before this thread ends
+                successor.start()
+            elif self.on_done:
+                # The UI waits for this whether or not the job got through
+                self.on_done()
+
+    def _enrich(self):
+        db_handler = Database(self.db_name)
+        # The upload that started this job has just changed the history
+        refresh_snapshot(self.db_name)
+        # Videos already in the metadata cache were filled in at save time
+        video_ids = db_handler.uncached_video_ids()
+        if not video_ids:
+            return
+
+        try:
+            yt_api = YouTubeAPI(self.api_key)
+            category_map = yt_api.get_category_mapping()
+        except Exception as e:
+            print(f"[Enrichment] Could not reach the YouTube API: {e}")
+            return
+
+        done = 0
+        for batch, meta_df in yt_api.iter_vid_meta(video_ids, category_map):
+            db_handler.add_quota_use("enrich")
+            if self._stop.is_set():
+                break
+            db_handler.update_video_metadata(meta_df, batch)
+            done += len(batch)
+            if self.on_batch:
+                self.on_batch(done, len(video_ids))
+
+        print(f"[Enrichment] Enriched {done}/{len(video_ids)} videos")
+        refresh_snapshot(self.db_name)
+
+
+class MetadataRefresher:
+    """Low-priority loop that re-fetches the oldest cached metadata within a daily API quota slice"""
+    def __init__(self, api_key, db_name, max_age_days, daily_quota, interval_s=3600, pause_s=2.0,
+                 is_busy=None, on_batch=None):
+        self.api_key = api_key
+        self.db_name = db_name
+        self.max_age_days = max_age_days
+        self.daily_quota = daily_quota
+        self.interval_s = interval_s
+        self.pause_s = pause_s
+        self.is_busy = is_busy
+        self.on_batch = on_batch
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        yt_api = None
+        category_map = None
+        db_handler = Database(self.db_name)
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set():
+                    # Upload enrichment owns the API while it runs
+                    if self.is_busy and self.is_busy():
+                        break
+                    if db_handler.quota_used("refresh") >= self.daily_quota:
+                        break
+                    video_ids = db_handler.stale_video_ids(self.max_age_days, limit=50)
+                    if not video_ids:
+                        break
+                    if yt_api is None:
+                        yt_api = YouTubeAPI(self.api_key)
+                        category_map = yt_api.get_category_mapping()
+                    db_handler.add_quota_use("refresh")
+                    fetched = list(yt_api.iter_vid_meta(video_ids, category_map))
+                    if not fetched:
+                        break  # API error; try again on the next interval
+                    for batch, meta_df in fetched:
+                        db_handler.update_video_metadata(meta_df, batch)
+                    if self.on_batch:
+                        self.on_batch(len(video_ids))
+                    self._stop.wait(self.pause_s)
+                refresh_snapshot(self.db_name)
+            except Exception as e:
+                print(f"[Refresh] Metadata refresh failed: {e}")
+            self._stop.wait(self.interval_s)
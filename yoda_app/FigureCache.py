@@ -0,0 +1,55 @@
+# FigureCache.py
+import json
+import threading
+from collections import OrderedDict
+import plotly.io as pio
+
+class FigureCache:
+    """Least-recently-used cache of built figures, stored as Plotly JSON.
+
+    Keys are (stamp, filters, chart), the stamp being the DB's (db_id, data_version), so an entry is
+    only reused for exactly the same chart of the same data, even across a re-created DB whose
+    version counter has started again; entries for an old stamp are never asked for again and age out.
+    Eviction keeps both the number of entries and the total JSON size within bounds.
+    """
+    def __init__(self, max_bytes, max_entries=512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """The cached figure as a dict, or None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(text)
+
+    def put(self, key, figure):
+        """Cache a figure and return it as a dict"""
+        text = pio.to_json(figure, validate=False)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            if len(text) <= self.max_bytes:
+                self._entries[key] = text
+                self._bytes += len(text)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= len(self._entries.popitem(last=False)[1])
+        return json.loads(text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,173 @@
+# MemoryQueries.py
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from Queries import HistoryQueries, day_to_date, date_to_day, week_labels, week_category_table
+from DatasetCache import DatasetCache
+
+class MemoryQueries:
+    """HistoryQueries answered from the in-memory rollups of the shared DatasetCache.
+
+    The cached rollups are sorted by day, so a date range is two binary searches and a zero-copy
+    slice; channel and category filters are masks over that slice, and the grouping is np.bincount
+    over the categorical codes. A filter change never touches SQLite. Text filters need per-event rows,
+    which the rollups do not keep; those aggregates are delegated to the SQLite layer.
+    """
+    def __init__(self, db_name):
+        self.cache = DatasetCache.shared(db_name)
+        self.sqlite = HistoryQueries(db_name)
+        self._local = threading.local()
+
+    @contextmanager
+    def pinned(self):
+        """Answer every query in the block from the same cached dataset (see HistoryQueries.pinned)"""
+        if getattr(self._local, "dataset", None) is not None:
+            yield
+            return
+        with self.sqlite.pinned():
+            self._local.dataset = self.cache.get()
+            try:
+                yield
+            finally:
+                self._local.dataset = None
+
+    def close(self):
+        self.sqlite.close()
+
+    def _dataset(self):
+        return getattr(self._local, "dataset", None) or self.cache.get()
+
+    @staticmethod
+    def _day_slice(frame, filters):
+        """Rows of a day-sorted frame within the date range, as a slice"""
+        days = frame["day"].to_numpy()
+        start = np.searchsorted(days, date_to_day(filters.start_date), "left") if filters.start_date else 0
+        end = np.searchsorted(days, date_to_day(filters.end_date), "right") if filters.end_date else len(days)
+        return slice(start, end)
+
+    def _watch(self, filters):
+        """Filtered watch rollup rows: (day, channel codes, category codes, n, channel labels, category labels)"""
+        watch = self._dataset().watch
+        channel, category = watch["channel_name"].cat, watch["category_name"].cat
+        rows = self._day_slice(watch, filters)
+        days, channels = watch["day"].to_numpy()[rows], channel.codes.to_numpy()[rows]
+        categories, counts = category.codes.to_numpy()[rows], watch["n"].to_numpy()[rows]
+        if filters.channel or filters.category:
+            mask = np.ones(len(days), dtype=bool)
+            if filters.channel:
+                mask &= self._matches(channels, channel.categories, filters.channel)
+            if filters.category:
+                mask &= self._matches(categories, category.categories, filters.category)
+            days, channels, categories, counts = days[mask], channels[mask], categories[mask], counts[mask]
+        return days, channels, categories, counts, channel.categories, category.categories
+
+    @staticmethod
+    def _matches(codes, labels, label):
+        code = labels.get_indexer([label])[0]
+        return (codes == code) & (code >= 0)  # an unknown label matches nothing, not NaN
+
+    def _search(self, filters):
+        search = self._dataset().search
+        rows = self._day_slice(search, filters)
+        return (search["day"].to_numpy()[rows], search["term"].cat.codes.to_numpy()[rows],
+                search["n"].to_numpy()[rows], search["term"].cat.categories)
+
+    @staticmethod
+    def _totals(codes, n, labels):
+        """Sum of n per label, for labels with a positive total, largest first"""
+        sums = np.bincount(codes, weights=n, minlength=len(labels)).astype("int64")
+        keep = np.flatnonzero(sums > 0)
+        keep = keep[np.argsort(-sums[keep], kind="stable")]
+        return pd.Series(sums[keep], index=pd.Index(labels[keep], dtype=object), dtype="int64")
+
+    @staticmethod
+    def _by_day(days, n):
+        if not len(days):
+            return pd.Series([], index=day_to_date([]), dtype="int64")
+        first = days.min()
+        sums = np.bincount(days - first, weights=n).astype("int64")
+        present = np.flatnonzero(sums > 0)
+        return pd.Series(sums[present], index=day_to_date(present + first), dtype="int64")
+
+    # --- Dataset summary ---
+    def stamp(self):
+        dataset = self._dataset()
+        return (dataset.db_id, dataset.version) if dataset else None
+
+    def has_data(self):
+        dataset = self._dataset()
+        return bool(dataset and (len(dataset.watch) or len(dataset.search)))
+
+    def date_range(self):
+        dataset = self._dataset()
+        if dataset is None or dataset.watch.empty:
+            return None, None
+        first, last = day_to_date([dataset.watch["day"].min(), dataset.watch["day"].max()])
+        return first.date(), last.date()
+
+    def channels(self):
+        dataset = self._dataset()
+        return dataset.channels if dataset else []
+
+    def categories(self):
+        dataset = self._dataset()
+        return dataset.categories if dataset else []
+
+    # --- Chart aggregates ---
+    def top_channels(self, filters, n=10):
+        if filters.text or self._dataset() is None:
+            return self.sqlite.top_channels(filters, n)
+        _, channels, _, counts, labels, _ = self._watch(filters)
+        return self._totals(channels, counts, labels).head(n)
+
+    def top_searches(self, filters, n=10):
+        if filters.text or self._dataset() is None:
+            return self.sqlite.top_searches(filters, n)
+        _, terms, counts, labels = self._search(filters)
+        return self._totals(terms, counts, labels).head(n)
+
+    def category_counts(self, filters):
+        if filters.text or self._dataset() is None:
+            return self.sqlite.category_counts(filters)
+        _, _, categories, counts, _, labels = self._watch(filters)
+        known = categories >= 0
+        return self._totals(categories[known], counts[known], labels)
+
+    def daily_counts(self, filters):
+        if filters.text or self._dataset() is None:
+            return self.sqlite.daily_counts(filters)
+        days, _, _, counts, _, _ = self._watch(filters)
+        return self._by_day(days, counts)
+
+    def daily_search_counts(self, filters):
+        if filters.text or self._dataset() is None:
+            return self.sqlite.daily_search_counts(filters)
+        days, _, counts, _ = self._search(filters)
+        return self._by_day(days, counts)
+
+    def hourly_counts(self, filters):
+        return self.sqlite.hourly_counts(filters)
+
+    def weekly_counts(self, filters):
+        """Counts per ISO week, labelled 'YYYY-Www'"""
+        if filters.text or self._dataset() is None:
+            return self.sqlite.weekly_counts(filters)
+        days, _, _, counts, _, _ = self._watch(filters)
+        weeks = (days + 3) // 7
+        if not len(weeks):
+            return pd.Series([], dtype="int64")
+        first = weeks.min()
+        sums = np.bincount(weeks - first, weights=counts).astype("int64")
+        present = np.flatnonzero(sums > 0)
+        return pd.Series(sums[present], index=week_labels(present + first), dtype="int64")
+
+    def category_weekly(self, filters):
+        """Week (ending Sunday) x category counts"""
+        if filters.text or self._dataset() is None:
+            return self.sqlite.category_weekly(filters)
+        days, _, categories, counts, _, labels = self._watch(filters)
+        known = categories >= 0
+        if not known.any():
+            return pd.DataFrame()
+        return week_category_table((days[known] + 3) // 7, labels[categories[known]], counts[known])
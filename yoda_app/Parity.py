@@ -0,0 +1,101 @@
+# Parity.py
+"""Check that every query backend draws the same charts from the same history.
+
+Usage: python Parity.py [db] [backend ...]    (default: a synthetic history; sqlite memory duckdb)
+
+Without a db it builds a synthetic history in a temporary directory first (Benchmark.make_watch_df
+plus categories, some left unknown, and searches whose terms differ only in case and whitespace),
+so it runs from a clean checkout. The first backend is the reference. Each chart aggregate is compared under a spread of filters
+(all time, a date window, the busiest channel and category, a text search); top-N lists only
+have to agree up to the order of tied counts. Exits non-zero on any mismatch.
+"""
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from Database import Database
+from Benchmark import make_watch_df
+from Queries import make_queries, make_filters
+
+SYNTHETIC_ROWS = 20_000
+CATEGORIES = ["Music", "Gaming", "Education", "Comedy", "News & Politics", "Science & Technology", None]
+# Variants that only the search-term normalisation (Database.normalize_term) folds together
+TERMS = ["python", "Python ", " PYTHON", "python\t", "dash plotly", "Dash Plotly\n", "İstanbul", "istanbul",
+         "lofi beats", "sqlite wal"]
+
+AGGREGATES = ["top_channels", "top_searches", "category_counts", "daily_counts", "daily_search_counts",
+              "weekly_counts", "category_weekly"]
+
+def same(name, a, b):
+    if isinstance(a, pd.DataFrame) or isinstance(b, pd.DataFrame):
+        if a.empty and b.empty:
+            return True
+        return a.sort_index(axis=1).equals(b.sort_index(axis=1))
+    if name.startswith("top_"):
+        # The cut-off may fall inside a run of equal counts
+        shared = a.index.intersection(b.index)
+        return sorted(a.values) == sorted(b.values) and a[shared].equals(b[shared])
+    return a.sort_index().to_dict() == b.sort_index().to_dict()
+
+def filter_cases(queries):
+    start, end = queries.date_range()
+    if start is None:
+        return [make_filters(None, None, None, None)]
+    everything = make_filters(None, None, None, None)
+    mid = start + (end - start) / 2
+    channel = next(iter(queries.top_channels(everything, 1).index), None)
+    category = next(iter(queries.category_counts(everything).index), None)
+    term = next(iter(queries.top_searches(everything, 1).index), None)
+    return [
+        everything,
+        make_filters(start, end, None, None),
+        make_filters(start, mid, None, None),
+        make_filters(mid, end, channel, None),
+        make_filters(None, None, None, category),
+        make_filters(start, mid, channel, category),
+        make_filters(None, None, None, None, term),
+    ]
+
+def make_history(db_name, rows=SYNTHETIC_ROWS, seed=0):
+    """Store a synthetic watch and search history in db_name, with metadata for every video"""
+    rng = np.random.default_rng(seed)
+    watch_df = make_watch_df(rows, seed)
+    times = watch_df["time"].sample(rows // 4, random_state=seed).sort_values()
+    search_df = pd.DataFrame({"time": times.to_numpy(), "title": rng.choice(TERMS, len(times)),
+                              "category_guess": None})
+    db = Database(db_name)
+    db.save_to_database(watch_df, search_df)
+    video_ids = db.uncached_video_ids()
+    categories = rng.integers(0, len(CATEGORIES), len(video_ids))
+    db.update_video_metadata(pd.DataFrame({
+        "video_id": video_ids,
+        "category_id": [None if CATEGORIES[c] is None else str(c) for c in categories],
+        "video_title": [f"Video {v}" for v in video_ids],
+        "video_description": [f"About {CATEGORIES[c] or 'nothing'}" for c in categories],
+        "category_name": [CATEGORIES[c] for c in categories],
+    }), video_ids)
+
+def main(db_name, backends):
+    reference, *others = [(name, make_queries(db_name, name)) for name in backends]
+    mismatches = 0
+    for filters in filter_cases(reference[1]):
+        for name in AGGREGATES:
+            expected = getattr(reference[1], name)(filters)
+            for backend, queries in others:
+                if not same(name, expected, getattr(queries, name)(filters)):
+                    mismatches += 1
+                    print(f"MISMATCH {backend} vs {reference[0]}: {name} {filters}")
+    print(f"{mismatches} mismatches across {', '.join(backends)}")
+    return mismatches
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    backends = args[1:] or ["sqlite", "memory", "duckdb"]
+    if args:
+        sys.exit(1 if main(args[0], backends) else 0)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        db_name = os.path.join(tmp, "parity.db")
+        make_history(db_name)
+        mismatches = main(db_name, backends)
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,92 @@
+# Partitions.py
+import glob
+import os
+import pathlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from BulkWriter import tune_connection, tune_read_connection, BUSY_TIMEOUT_S, STATEMENT_CACHE
+
+MAX_WORKERS = 4  # partitions scanned at once by a fan-out query
+
+# Shared by every fan-out, so a query does not start threads of its own; its threads start on first use
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="partitions")
+
+class PartitionStore:
+    """Watch events split into one SQLite file per UTC year next to the main DB (yt_history.2024.db, ...).
+
+    Every partition has the same watch_events table, keyed into the dimensions of the main DB.
+    Partitions are opened on demand with their own connection (rather than ATTACHed, which SQLite
+    caps at ten files and does not commit atomically across WAL databases), so a query over recent
+    months only touches this year's file however long the archive grows.
+    """
+    def __init__(self, db_name):
+        self.stem = os.path.splitext(db_name)[0]
+
+    @staticmethod
+    def create_schema(conn):
+        conn.execute("""CREATE TABLE IF NOT EXISTS watch_events (
+                            id INTEGER PRIMARY KEY,
+                            time_us INTEGER NOT NULL,
+                            channel_key INTEGER NOT NULL,
+                            video_key INTEGER,
+                            category_key INTEGER,
+                            local_day INTEGER,
+                            UNIQUE (time_us, channel_key)
+                        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_channel_time ON watch_events (channel_key, time_us)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_category_time ON watch_events (category_key, time_us)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_video ON watch_events (video_key)")
+
+    def path(self, year):
+        return f"{self.stem}.{year}.db"
+
+    def connect(self, year, readonly=False):
+        """A connection to one partition. Writers create and tune it; a read-only connection (for the
+        dashboard's queries) skips the WAL switch and the schema statements, which the writer has run."""
+        if readonly:
+            uri = pathlib.Path(self.path(year)).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE)
+            return tune_read_connection(conn)
+        conn = sqlite3.connect(self.path(year), timeout=BUSY_TIMEOUT_S, cached_statements=STATEMENT_CACHE)
+        tune_connection(conn)
+        self.create_schema(conn)
+        return conn
+
+    def years(self):
+        """Years that have a partition file, ascending"""
+        paths = glob.glob(glob.escape(self.stem) + ".[0-9][0-9][0-9][0-9].db")
+        return sorted(int(p[-7:-3]) for p in paths)
+
+    def years_between(self, start_day=None, end_day=None):
+        """Partitions overlapping a range of days since the epoch (inclusive; None is open-ended)"""
+        first = pd.Timestamp(start_day, unit="D").year if start_day is not None else None
+        last = pd.Timestamp(end_day, unit="D").year if end_day is not None else None
+        return [y for y in self.years() if (first is None or y >= first) and (last is None or y <= last)]
+
+    @staticmethod
+    def years_of(time_us):
+        """UTC year of each epoch-microsecond timestamp"""
+        return pd.to_datetime(pd.Series(time_us, dtype="int64"), unit="us").dt.year.to_numpy()
+
+    def map(self, fn, years, readonly=False):
+        """Run fn(conn, year) on each partition, several at a time; results come back in `years` order.
+
+        fn must not call map itself: it runs on the shared executor, whose workers could all be waiting on it.
+        """
+        def run(year):
+            conn = self.connect(year, readonly)
+            try:
+                return fn(conn, year)
+            finally:
+                conn.close()
+        if len(years) < 2:
+            return [run(y) for y in years]
+        return list(_executor.map(run, years))
+
+    def set_aside(self, suffix):
+        """Rename every partition (with its -wal/-shm files) out of the way, e.g. when the main DB was deleted"""
+        for year in self.years():
+            for ext in ("", "-wal", "-shm"):
+                if os.path.exists(self.path(year) + ext):
+                    os.replace(self.path(year) + ext, f"{self.path(year)}.{suffix}{ext}")
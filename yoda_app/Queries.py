@@ -0,0 +1,319 @@
+# Queries.py
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from Database import Database
+from Partitions import PartitionStore
+from ConnectionPool import ReadConnectionPool
+
+Filters = namedtuple("Filters", ["start_date", "end_date", "channel", "category", "text"], defaults=[None])
+
+# Chart aggregates read the watch_daily / search_daily rollups, whose day column counts local days
+# (Config.TIMEZONE) since 1970-01-01; Monday-based weeks are (day + 3) / 7 because 1970-01-01 was a Thursday
+WEEK = "((day + 3) / 7)"
+
+def day_to_date(days):
+    return pd.to_datetime(np.asarray(days, dtype="int64"), unit="D")
+
+def date_to_day(date):
+    return (pd.Timestamp(date) - pd.Timestamp(0)).days
+
+def day_bounds(filters):
+    """WHERE clauses and parameters limiting a `day` column to the filters' date range"""
+    clauses, params = [], []
+    if filters.start_date:
+        clauses.append("day >= ?")
+        params.append(date_to_day(filters.start_date))
+    if filters.end_date:
+        clauses.append("day <= ?")
+        params.append(date_to_day(filters.end_date))
+    return clauses, params
+
+def week_labels(weeks):
+    """'YYYY-Www' ISO week labels for Monday-based week numbers (see WEEK)"""
+    mondays = day_to_date(np.asarray(weeks, dtype="int64") * 7 - 3)
+    return [f"{year}-W{week:02d}" for year, week, _ in (m.isocalendar() for m in mondays)]
+
+def week_category_table(weeks, categories, counts):
+    """Week (ending Sunday) x category counts from parallel week number / category / count columns"""
+    table = pd.DataFrame({"week": weeks, "category_name": categories, "n": counts}).pivot_table(
+        index="week", columns="category_name", values="n", aggfunc="sum", fill_value=0)
+    table.index = day_to_date(table.index * 7 + 3)
+    return table
+
+# Bin sizes of the activity chart, finest first; a bin is picked so the visible range fits the point budget
+BIN_UNITS = [("hour", pd.Timedelta(hours=1)), ("day", pd.Timedelta(days=1)), ("week", pd.Timedelta(days=7)),
+             ("month", pd.Timedelta(days=30.44))]
+
+def pick_unit(span, max_bins):
+    """The finest bin unit that cuts a time span into at most max_bins bins"""
+    for unit, width in BIN_UNITS:
+        if span / width <= max_bins:
+            return unit
+    return BIN_UNITS[-1][0]
+
+def binned_counts(queries, filters, unit):
+    """Watch counts per local hour, day, Monday-based week or calendar month, indexed by the start of each bin.
+
+    Hours come from the events (queries.hourly_counts); the coarser bins add up the daily rollup.
+    """
+    if unit == "hour":
+        return queries.hourly_counts(filters)
+    daily = queries.daily_counts(filters)
+    if unit == "day" or daily.empty:
+        return daily
+    if unit == "week":
+        return daily.resample("W-MON", label="left", closed="left").sum()
+    return daily.resample("MS").sum()
+
+def make_filters(start_date, end_date, channel, category, text=None):
+    """Normalise raw dashboard inputs; None means the filter is not applied"""
+    return Filters(
+        pd.to_datetime(start_date).date() if start_date else None,
+        pd.to_datetime(end_date).date() if end_date else None,
+        channel if channel and channel != 'All' else None,
+        category if category and category != 'All' else None,
+        fts_query(text),
+    )
+
+def make_queries(db_name, backend="sqlite"):
+    """Query layer for the configured backend: 'sqlite' (rollups), 'memory' (cached rollups) or 'duckdb' (Arrow snapshot)"""
+    if backend == "duckdb":
+        from DuckDBQueries import DuckDBQueries
+        return DuckDBQueries(db_name)
+    if backend == "memory":
+        from MemoryQueries import MemoryQueries
+        return MemoryQueries(db_name)
+    return HistoryQueries(db_name)
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, each as a quoted prefix"""
+    words = str(text or "").split()
+    if not words:
+        return None
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+class HistoryQueries:
+    """Dashboard aggregations with the date, channel and category predicates and the grouping pushed into SQLite.
+
+    Charts are answered from the daily rollups, so their cost follows the number of days in range
+    rather than the number of stored events. A text filter swaps each rollup for the same shape
+    aggregated from just the rows the FTS5 index matches, read from the year partitions that
+    overlap the date range in parallel.
+    """
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.partitions = PartitionStore(db_name)
+        self.pool = ReadConnectionPool(db_name)
+        self._local = threading.local()
+
+    @contextmanager
+    def pinned(self):
+        """Answer every query in the block from one read transaction.
+
+        A redraw then never mixes rows from before and after an ingest that commits halfway through
+        it; under WAL the reader keeps its snapshot without holding up the writer.
+        """
+        if getattr(self._local, "conn", None) is not None or not os.path.exists(self.db_name):
+            yield
+            return
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN")
+            conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()  # take the snapshot now
+            self._local.conn = conn
+            try:
+                yield
+            finally:
+                self._local.conn = None
+
+    def close(self):
+        """Drop the pooled connections, e.g. after the DB file has been replaced"""
+        self.pool.close()
+
+    def _rows(self, sql, params=()):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return self._execute(conn, sql, params)
+        if not os.path.exists(self.db_name):
+            return []
+        with self.pool.connection() as conn:
+            return self._execute(conn, sql, params)
+
+    @staticmethod
+    def _execute(conn, sql, params):
+        try:
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"[Queries] {e}")
+            return []
+
+    def _watch_source(self, filters):
+        """watch_daily, or its equivalent over the events whose video matches the text filter"""
+        if not filters.text:
+            return "watch_daily", []
+        video_keys = json.dumps([r[0] for r in self._rows(
+            "SELECT rowid FROM videos_fts WHERE videos_fts MATCH ?", (filters.text,))])
+        start = date_to_day(filters.start_date) if filters.start_date else None
+        end = date_to_day(filters.end_date) if filters.end_date else None
+        where = ["video_key IN (SELECT value FROM json_each(?))"]
+        params = [video_keys]
+        if start is not None:
+            where.append("local_day >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("local_day <= ?")
+            params.append(end)
+        # Partitions split at UTC new year; a local day can fall a day either side of its UTC date
+        parts = self.partitions.map(lambda conn, _: Database.watch_counts(conn, " AND ".join(where), params),
+                                    self.partitions.years_between(
+            start - 1 if start is not None else None, end + 1 if end is not None else None), readonly=True)
+        return ("""(SELECT json_extract(value, '$[0]') AS day, json_extract(value, '$[1]') AS channel_key,
+                           json_extract(value, '$[2]') AS category_key, json_extract(value, '$[3]') AS n
+                    FROM json_each(?))""", [json.dumps([row for part in parts for row in part])])
+
+    @staticmethod
+    def _search_source(filters):
+        """search_daily, or its equivalent over the searches matching the text filter"""
+        if not filters.text:
+            return "search_daily", []
+        return ("""(SELECT local_day AS day, normalize_term(title) AS term, COUNT(*) AS n
+                     FROM search_history
+                     WHERE id IN (SELECT rowid FROM search_fts WHERE search_fts MATCH ?)
+                     GROUP BY 1, 2)""", [filters.text])
+
+    def _watch_from(self, filters, extra=()):
+        """FROM source and WHERE clause for the watch rollup"""
+        source, params = self._watch_source(filters)
+        clauses, bounds = day_bounds(filters)
+        params = params + bounds
+        if filters.channel:
+            clauses.append("channel_key = (SELECT channel_key FROM channels WHERE channel_name = ?)")
+            params.append(filters.channel)
+        if filters.category:
+            clauses.append("category_key IN (SELECT category_key FROM categories WHERE category_name = ?)")
+            params.append(filters.category)
+        clauses.extend(extra)
+        return source + (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _search_from(self, filters):
+        """Search rows only honour the date range and the text filter"""
+        source, params = self._search_source(filters)
+        clauses, bounds = day_bounds(filters)
+        return source + (" WHERE " + " AND ".join(clauses) if clauses else ""), params + bounds
+
+    def text_matches(self, text):
+        """Video ids and search row ids matching an FTS5 query"""
+        video_ids = [r[0] for r in self._rows(
+            "SELECT video_id FROM videos WHERE video_key IN (SELECT rowid FROM videos_fts WHERE videos_fts MATCH ?)",
+            (text,))]
+        search_ids = [r[0] for r in self._rows("SELECT rowid FROM search_fts WHERE search_fts MATCH ?", (text,))]
+        return video_ids, search_ids
+
+    @staticmethod
+    def _series(rows, name=None):
+        return pd.Series([r[1] for r in rows], index=[r[0] for r in rows], name=name, dtype="int64")
+
+    # --- Dataset summary ---
+    def stamp(self):
+        """(db_id, data_version) of the history being read (see Database.read_stamp); None without a DB"""
+        meta = dict(self._rows("SELECT key, value FROM meta WHERE key IN ('db_id', 'data_version')"))
+        return (meta.get("db_id"), meta["data_version"]) if meta else None
+
+    def has_data(self):
+        rows = self._rows("SELECT EXISTS (SELECT 1 FROM watch_daily) OR EXISTS (SELECT 1 FROM search_history)")
+        return bool(rows and rows[0][0])
+
+    def date_range(self):
+        rows = self._rows("SELECT MIN(day), MAX(day) FROM watch_daily")
+        if not rows or rows[0][0] is None:
+            return None, None
+        first, last = day_to_date(rows[0])
+        return first.date(), last.date()
+
+    def channels(self):
+        return [r[0] for r in self._rows("SELECT channel_name FROM channels ORDER BY channel_name")]
+
+    def categories(self):
+        return [r[0] for r in self._rows(
+            "SELECT DISTINCT category_name FROM categories WHERE category_name IS NOT NULL ORDER BY category_name")]
+
+    # --- Chart aggregates ---
+    def top_channels(self, filters, n=10):
+        source, params = self._watch_from(filters)
+        return self._series(self._rows(
+            f"""SELECT c.channel_name, t.n
+                FROM (SELECT channel_key, SUM(n) AS n FROM {source}
+                      GROUP BY channel_key ORDER BY n DESC LIMIT ?) AS t
+                JOIN channels AS c USING (channel_key)
+                ORDER BY t.n DESC""",
+            params + [n]))
+
+    def top_searches(self, filters, n=10):
+        source, params = self._search_from(filters)
+        return self._series(self._rows(
+            f"SELECT term, SUM(n) AS n FROM {source} GROUP BY term ORDER BY n DESC LIMIT ?",
+            params + [n]))
+
+    def category_counts(self, filters):
+        source, params = self._watch_from(filters, ["category_key <> 0"])
+        counts = self._series(self._rows(
+            f"""SELECT c.category_name, t.n
+                FROM (SELECT category_key, SUM(n) AS n FROM {source}
+                      GROUP BY category_key HAVING n > 0) AS t
+                JOIN categories AS c USING (category_key)""",
+            params))
+        return counts.groupby(level=0).sum().sort_values(ascending=False)
+
+    def daily_counts(self, filters):
+        source, params = self._watch_from(filters)
+        counts = self._series(self._rows(
+            f"SELECT day, SUM(n) FROM {source} GROUP BY day HAVING SUM(n) > 0 ORDER BY day", params))
+        counts.index = day_to_date(counts.index)
+        return counts
+
+    def daily_search_counts(self, filters):
+        source, params = self._search_from(filters)
+        counts = self._series(self._rows(
+            f"SELECT day, SUM(n) FROM {source} GROUP BY day ORDER BY day", params))
+        counts.index = day_to_date(counts.index)
+        return counts
+
+    def hourly_counts(self, filters):
+        """Counts per local hour, indexed by the hour's start; reads the events, so meant for short ranges"""
+        db = Database(self.db_name)
+        videos = set(self.text_matches(filters.text)[0]) if filters.text else None
+        hours = []
+        for chunk in db.iter_watch(["time", "video_id"] if filters.text else ["time"],
+                                   filters.start_date, filters.end_date, filters.channel, filters.category):
+            if videos is not None:
+                chunk = chunk[chunk["video_id"].isin(videos)]
+            hours.append(chunk["time"].dt.tz_convert(db.timezone).dt.tz_localize(None).dt.floor("h"))
+        if not hours:
+            return pd.Series([], index=pd.DatetimeIndex([]), dtype="int64")
+        return pd.concat(hours).value_counts().sort_index().rename(None).rename_axis(None).astype("int64")
+
+    def weekly_counts(self, filters):
+        """Counts per ISO week, labelled 'YYYY-Www'"""
+        source, params = self._watch_from(filters)
+        rows = self._rows(
+            f"SELECT {WEEK} AS week, SUM(n) FROM {source} GROUP BY week HAVING SUM(n) > 0 ORDER BY week",
+            params)
+        return pd.Series([r[1] for r in rows], index=week_labels([r[0] for r in rows]), dtype="int64")
+
+    def category_weekly(self, filters):
+        """Week (ending Sunday) x category counts"""
+        source, params = self._watch_from(filters, ["category_key <> 0"])
+        rows = self._rows(
+            f"""SELECT t.week, c.category_name, t.n
+                FROM (SELECT {WEEK} AS week, category_key, SUM(n) AS n FROM {source}
+                      GROUP BY week, category_key HAVING n > 0) AS t
+                JOIN categories AS c USING (category_key)""",
+            params)
+        if not rows:
+            return pd.DataFrame()
+        return week_category_table(*zip(*rows))
@@ -0,0 +1,41 @@
+# Server.py
+"""Serve the dashboard headless, without PyQt or a web view.
+
+    python Server.py [--host HOST] [--port PORT] [--threads N]
+
+runs it under waitress (multi-threaded) when installed, else under werkzeug's threaded server.
+For several processes, point any WSGI server at `Server:server` from inside yoda_app/, e.g.
+
+    gunicorn --workers 4 --threads 4 --bind 0.0.0.0:8050 Server:server
+
+Each worker keeps its own figure cache; the rollups are loaded once per data version and shared
+through the memory-mapped RollupSnapshot files (see DatasetCache).
+"""
+import argparse
+try:
+    import waitress
+except ImportError:  # waitress is optional; without it the threaded werkzeug server is used
+    waitress = None
+from werkzeug.serving import run_simple
+from Config import DASH_PORT, SERVER_HOST, SERVER_THREADS
+from DashboardApp import DashboardApp
+
+dashboard = DashboardApp()
+# The WSGI application
+server = dashboard.server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the YODA dashboard without the desktop app")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=DASH_PORT)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS)
+    args = parser.parse_args(argv)
+    print(f"[Server] Dashboard at http://{args.host}:{args.port}")
+    if waitress is not None:
+        waitress.serve(server, host=args.host, port=args.port, threads=args.threads)
+    else:
+        print("[Server] waitress is not installed; using werkzeug's threaded server")
+        run_simple(args.host, args.port, server, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Snapshot.py
+import os
+import tempfile
+import pandas as pd
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional; without it every read goes through SQLite
+    pa = None
+from Database import Database, CHUNK_ROWS
+
+VERSION_KEY = b"yoda.data_version"
+DB_ID_KEY = b"yoda.db_id"
+
+def _stamp_metadata(stamp):
+    """File metadata for a Database.stamp(): a version only means something within one database"""
+    db_id, version = stamp
+    return {DB_ID_KEY: str(db_id).encode(), VERSION_KEY: str(version).encode()}
+
+def _read_stamp(metadata):
+    if DB_ID_KEY not in metadata:  # written before files were stamped with the database id
+        return None
+    return int(metadata[DB_ID_KEY]), int(metadata[VERSION_KEY])
+
+def _schemas():
+    labels = pa.dictionary(pa.int32(), pa.string())
+    timestamp = pa.timestamp("us", tz="UTC")
+    return {
+        "watch": pa.schema([("time", timestamp), ("day", pa.int32()), ("title", labels), ("channel_name", labels), ("video_id", labels),
+                            ("category_id", labels), ("category_name", labels)]),
+        "search": pa.schema([("id", pa.int64()), ("time", timestamp), ("day", pa.int32()), ("title", labels),
+                             ("category_guess", labels)]),
+    }
+
+class HistorySnapshot:
+    """Columnar copy of the stored history in Arrow IPC files next to the DB.
+
+    The files are uncompressed, so a load memory-maps them and only touches the columns it asks for:
+    timestamps stay typed and repeated strings stay dictionary-encoded instead of going through a
+    Python object per row. Each file records the DB id and data_version it was written from and is
+    ignored once the DB has moved on or been replaced.
+    """
+    TABLES = ("watch", "search")
+
+    def __init__(self, db_name):
+        self.db = Database(db_name)
+        stem = os.path.splitext(db_name)[0]
+        self.paths = {name: f"{stem}.{name}.arrow" for name in self.TABLES}
+
+    @staticmethod
+    def available():
+        return pa is not None
+
+    def write(self, chunk_rows=CHUNK_ROWS):
+        """Rewrite both files from the DB, streaming it chunk by chunk; returns the data version written, or None"""
+        if pa is None or not os.path.exists(self.db.db_name):
+            return None
+        # Rows committed while streaming only make a file newer than its stamp, which reads as stale
+        stamp = self.db.stamp()
+        # An IPC file holds one dictionary per field, so every search chunk is encoded against labels
+        # taken from the whole table (watch labels already come from the dimension tables)
+        search_labels = {c: pd.CategoricalDtype(self.db.search_labels(c)) for c in ("title", "category_guess")}
+        chunks = {
+            "watch": self.db.iter_watch(chunk_rows=chunk_rows),
+            "search": (c.astype(search_labels) for c in self.db.iter_search(chunk_rows=chunk_rows)),
+        }
+        for name, schema in _schemas().items():
+            schema = schema.with_metadata(_stamp_metadata(stamp))
+            # Readers either see the previous file or the complete new one; writers on other threads
+            # (the enricher, the refresher, DuckDBQueries) each stream into their own temporary file
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.paths[name]) + ".", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(self.paths[name])))
+            os.close(fd)
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                for chunk in chunks[name]:
+                    writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            try:
+                os.replace(tmp_path, self.paths[name])
+            except PermissionError as e:  # the old file is still mapped by a reader (Windows)
+                print(f"[Snapshot] Could not replace {self.paths[name]}: {e}")
+                os.remove(tmp_path)
+                return None
+        return stamp[1]
+
+    def refresh(self):
+        """Write the snapshot unless it already matches the DB"""
+        if pa is None:
+            return None
+        stamp = self.db.stamp()
+        if stamp is not None and all(self._file_stamp(name) == stamp for name in self.TABLES):
+            return stamp[1]
+        return self.write()
+
+    def _open(self, name):
+        try:
+            return pa.ipc.open_file(pa.memory_map(self.paths[name]))
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+    def _file_stamp(self, name):
+        reader = self._open(name)
+        if reader is None:
+            return None
+        return _read_stamp(reader.schema.metadata)
+
+    def load_table(self, name, columns=None, version=None):
+        """Memory-map one table ('watch' or 'search') as an Arrow table; None if missing or not at `version`
+        (by default the DB's current data version)"""
+        if pa is None:
+            return None
+        reader = self._open(name)
+        stamp = self.db.stamp()
+        if reader is None or stamp is None:
+            return None
+        if _read_stamp(reader.schema.metadata) != (stamp[0], stamp[1] if version is None else version):
+            return None
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select(columns)
+        return table
+
+class RollupSnapshot:
+    """The daily rollups (as returned by Database.read_rollups) in Arrow IPC files next to the DB.
+
+    DatasetCache loads them from here when they match the DB's stamp (id and data version) and writes
+    them when they do not, so several processes serving one DB (the headless server's workers) read the
+    rollups out of SQLite once per version between them and map the same read-only files.
+    """
+    TABLES = ("watch", "search")
+
+    def __init__(self, db_name):
+        stem = os.path.splitext(db_name)[0]
+        self.paths = {name: f"{stem}.rollups.{name}.arrow" for name in self.TABLES}
+
+    def write(self, stamp, watch, search):
+        """Store both rollups stamped with `stamp` (see Database.stamp); returns whether they were written"""
+        if pa is None:
+            return False
+        for name, frame in zip(self.TABLES, (watch, search)):
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            table = table.replace_schema_metadata({**table.schema.metadata, **_stamp_metadata(stamp)})
+            # Workers may write the same version at once, each through its own temporary file
+            tmp_path = f"{self.paths[name]}.{os.getpid()}.tmp"
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            try:
+                os.replace(tmp_path, self.paths[name])
+            except PermissionError as e:  # the old file is still mapped by a reader (Windows)
+                print(f"[Snapshot] Could not replace {self.paths[name]}: {e}")
+                os.remove(tmp_path)
+                return False
+        return True
+
+    def load(self, stamp):
+        """(watch, search) as written at `stamp`; None if either file is missing or from another stamp"""
+        if pa is None:
+            return None
+        frames = []
+        for name in self.TABLES:
+            try:
+                reader = pa.ipc.open_file(pa.memory_map(self.paths[name]))
+            except (FileNotFoundError, pa.ArrowInvalid):
+                return None
+            if _read_stamp(reader.schema.metadata) != tuple(stamp):
+                return None
+            frames.append(reader.read_all().to_pandas(split_blocks=True))
+        return tuple(frames)
@@ -6,18 +6,21 @@ from PyQt6.QtGui import QFont
 from PyQt6.QtCore import Qt, pyqtSignal
 import os
 from DataProcessing import DataProcessing
-from YT_api import YouTubeAPI
 from Database import Database
+from Enrichment import BackgroundEnricher
 from Config import API_KEY, DB_NAME
 
 class UploadWidget(QWidget):
     upload_done = pyqtSignal()
+    enrichment_progress = pyqtSignal(int, int)
+    enrichment_done = pyqtSignal()
     
     def __init__(self):
         super().__init__()
 
         self.watch_file = None
         self.search_file = None
+        self.enricher = None
 
         main_layout = QVBoxLayout(self)
         main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -123,20 +126,32 @@ class UploadWidget(QWidget):
                                'video_id', 'is_video']
         search_df_final = search_df_clean.drop(columns=[c for c in search_cols_to_drop if c in search_df_clean.columns])
 
-        # Enrich Watch History with YouTube API
-        yt_api = YouTubeAPI(API_KEY)
-        category_map = yt_api.get_category_mapping()
-        watch_enriched = yt_api.enrich_vid_meta(watch_df_clean, category_map)
-        watch_enriched['title'] = watch_enriched['video_title']
+        # Raw watch rows already carry channel names and timestamps; metadata is backfilled later
+        watch_df_clean['title'] = watch_df_clean['title'].str.replace(r'^Watched ', '', regex=True)
         watch_cols_to_drop = ['header', 'description', 'activity_controls', 'products',
-                              'search_detail', 'title_url', 'channel_url', 'video_title']
-        watch_enriched.drop(columns=[c for c in watch_cols_to_drop if c in watch_enriched.columns], inplace=True)
+                              'search_detail', 'title_url', 'channel_url']
+        watch_df_final = watch_df_clean.drop(columns=[c for c in watch_cols_to_drop if c in watch_df_clean.columns])
 
         # Save to Database
         db_handler = Database(DB_NAME)
-        db_handler.save_to_database(watch_enriched, search_df_final)
-
-        QMessageBox.information(self, "Success", f"Data processed and saved to {DB_NAME}")
+        db_handler.save_to_database(watch_df_final, search_df_final)
 
         # Emit signal for dashboard to reload
-        self.upload_done.emit()
\ No newline at end of file
+        self.upload_done.emit()
+
+        # Enrich Watch History with YouTube API in the background. Only one enrichment job spends API
+        # quota at a time: a running one is asked to stop, and the new one, which picks up whatever is
+        # still unfetched, starts when it has
+        previous, self.enricher = self.enricher, BackgroundEnricher(
+            API_KEY, DB_NAME,
+            on_batch=self.enrichment_progress.emit,
+            on_done=self.enrichment_done.emit
+        )
+        if previous is not None:
+            previous.replace_with(self.enricher)
+        else:
+            self.enricher.start()
+
+        QMessageBox.information(self, "Success",
+                                f"Data saved to {DB_NAME}. Video categories and titles are being "
+                                f"fetched in the background and will appear on the dashboard as they arrive.")
@@ -1,5 +1,4 @@
 from googleapiclient.discovery import build
-from tqdm import tqdm
 import pandas as pd
 
 class YouTubeAPI:
@@ -15,7 +14,7 @@ class YouTubeAPI:
             response = self.youtube.videos().list(part="snippet", id=",".join(video_ids)).execute()
         except Exception as e:
             print(f"API Error: {e}")
-            return []
+            return None
         results = []
         for item in response.get("items", []):
             vid = item["id"]
@@ -23,12 +22,14 @@ class YouTubeAPI:
             results.append((vid, snippet.get("categoryId"), snippet.get("title"), snippet.get("description")))
         return results
 
-    def enrich_vid_meta(self, df, category_map):
-        all_results = []
-        video_ids = df["video_id"].dropna().unique().tolist()
-        for i in tqdm(range(0, len(video_ids), 50), desc="Fetching video metadata"):
-            batch = video_ids[i:i+50]
-            all_results.extend(self.fetch_video_metadata(batch))
-        meta_df = pd.DataFrame(all_results, columns=["video_id", "category_id", "video_title", "video_description"])
-        meta_df["category_name"] = meta_df["category_id"].map(category_map)
-        return df.merge(meta_df, on="video_id", how="left")
+    def iter_vid_meta(self, video_ids, category_map, batch_size=50):
+        """Yield one metadata DataFrame per API batch so callers can persist results as they arrive"""
+        for i in range(0, len(video_ids), batch_size):
+            batch = video_ids[i:i+batch_size]
+            results = self.fetch_video_metadata(batch)
+            if results is None:
+                continue  # failed batches stay unfetched rather than being cached as empty
+            meta_df = pd.DataFrame(results,
+                                   columns=["video_id", "category_id", "video_title", "video_description"])
+            meta_df["category_name"] = meta_df["category_id"].map(category_map)
+            yield batch, meta_df
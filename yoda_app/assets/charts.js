@@ -0,0 +1,169 @@
+/* Browser-side dashboard charts (DashboardApp.CLIENT_CHARTS).
+
+   The 'rollups' store holds the daily rollups as sent by DashboardApp.client_rollups: label
+   dictionaries, day-sorted columns of codes and counts, and each chart as an empty figure.
+   Date, channel and category filters and the top-N ranking run here, so changing them never
+   reaches the server. A text filter needs per-event rows, and rollups over CLIENT_ROLLUP_ROWS are
+   not sent at all: server_query then asks the server for the figure, which arrives in the
+   'server-figure' store. */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    yoda: (function () {
+        var MS_PER_DAY = 86400000;
+        var decoded = null;
+
+        // Typed-array columns, with the day differences summed back into days; once per version (DB id and
+        // data version, so a re-created DB is decoded afresh)
+        function decode(rollups) {
+            if (decoded === null || decoded.version !== rollups.version) {
+                decoded = {version: rollups.version, watch: decodeTable(rollups.watch),
+                           search: decodeTable(rollups.search)};
+            }
+            return decoded;
+        }
+
+        function decodeTable(table) {
+            var columns = {};
+            Object.keys(table).forEach(function (name) {
+                columns[name] = name === 'n' ? Float64Array.from(table[name]) : Int32Array.from(table[name]);
+            });
+            for (var i = 1; i < columns.day.length; i++) {
+                columns.day[i] += columns.day[i - 1];
+            }
+            return columns;
+        }
+
+        // Days since 1970-01-01, as Queries.date_to_day
+        function toDay(date) {
+            return Math.floor(Date.parse(String(date).slice(0, 10)) / MS_PER_DAY);
+        }
+
+        // First row whose day is >= day (or > day when after is set), by binary search
+        function bound(days, day, after) {
+            var lo = 0, hi = days.length;
+            while (lo < hi) {
+                var mid = (lo + hi) >> 1;
+                if (days[mid] < day || (after && days[mid] === day)) lo = mid + 1; else hi = mid;
+            }
+            return lo;
+        }
+
+        function dayRange(table, start, end) {
+            return [start ? bound(table.day, toDay(start), false) : 0,
+                    end ? bound(table.day, toDay(end), true) : table.day.length];
+        }
+
+        // Code of a dropdown value: null for 'All', -2 (matches nothing) for an unknown label
+        function code(labels, value) {
+            if (!value || value === 'All') return null;
+            var index = labels.indexOf(value);
+            return index < 0 ? -2 : index;
+        }
+
+        // Sum of n per code over rows [lo, hi), skipping rows for which skip(i) is true
+        function sums(codes, n, size, lo, hi, skip) {
+            var totals = new Float64Array(size);
+            for (var i = lo; i < hi; i++) {
+                if (codes[i] >= 0 && !(skip && skip(i))) totals[codes[i]] += n[i];
+            }
+            return totals;
+        }
+
+        // Codes with a positive total, largest first (ties in code order, as MemoryQueries._totals)
+        function ranked(totals) {
+            var codes = [];
+            for (var i = 0; i < totals.length; i++) {
+                if (totals[i] > 0) codes.push(i);
+            }
+            return codes.sort(function (a, b) { return totals[b] - totals[a] || a - b; });
+        }
+
+        function figure(rollups, tab, fill) {
+            var fig = JSON.parse(JSON.stringify(rollups.figures[tab]));
+            fig.layout.template = rollups.template;
+            fill(fig.data[0]);
+            return fig;
+        }
+
+        function emptyFigure(rollups) {
+            return {data: [], layout: {template: rollups.template}};
+        }
+
+        function barFigure(rollups, tab, totals, labels) {
+            var top = ranked(totals).slice(0, rollups.top_n);
+            if (!top.length) return emptyFigure(rollups);
+            return figure(rollups, tab, function (trace) {
+                trace.y = top.map(function (c) { return labels[c]; });
+                trace.x = trace.text = top.map(function (c) { return totals[c]; });
+            });
+        }
+
+        function same(a, b) {
+            return (a === undefined ? null : a) === (b === undefined ? null : b);
+        }
+
+        var charts = {
+            channels: function (rollups, start, end, channel, category) {
+                var watch = decode(rollups).watch, rows = dayRange(watch, start, end);
+                var channelCode = code(rollups.channels, channel), categoryCode = code(rollups.categories, category);
+                var skip = categoryCode === null ? null : function (i) { return watch.category[i] !== categoryCode; };
+                var totals = sums(watch.channel, watch.n, rollups.channels.length, rows[0], rows[1], skip);
+                if (channelCode !== null) {
+                    totals = totals.map(function (total, c) { return c === channelCode ? total : 0; });
+                }
+                return barFigure(rollups, 'channels', totals, rollups.labels.channels);
+            },
+
+            searches: function (rollups, start, end) {
+                var search = decode(rollups).search, rows = dayRange(search, start, end);
+                var totals = sums(search.term, search.n, rollups.labels.terms.length, rows[0], rows[1], null);
+                return barFigure(rollups, 'searches', totals, rollups.labels.terms);
+            },
+
+            categories: function (rollups, start, end, channel, category) {
+                var watch = decode(rollups).watch, rows = dayRange(watch, start, end);
+                var channelCode = code(rollups.channels, channel), categoryCode = code(rollups.categories, category);
+                var skip = channelCode === null ? null : function (i) { return watch.channel[i] !== channelCode; };
+                var totals = sums(watch.category, watch.n, rollups.categories.length, rows[0], rows[1], skip);
+                if (categoryCode !== null) {
+                    totals = totals.map(function (total, c) { return c === categoryCode ? total : 0; });
+                }
+                var order = ranked(totals);
+                if (!order.length) return emptyFigure(rollups);
+                var all = order.reduce(function (sum, c) { return sum + totals[c]; }, 0);
+                var slices = [], others = 0;
+                order.forEach(function (c) {
+                    if (totals[c] / all >= rollups.others_share) slices.push([rollups.labels.categories[c], totals[c]]);
+                    else others += totals[c];
+                });
+                if (others > 0) slices.push([rollups.labels.others, others]);
+                slices.sort(function (a, b) { return b[1] - a[1]; });  // stable: ties keep their order
+                return figure(rollups, 'categories', function (trace) {
+                    trace.labels = slices.map(function (s) { return s[0]; });
+                    trace.values = slices.map(function (s) { return s[1]; });
+                });
+            }
+        };
+
+        var clientside = {
+            // The server query for a browser-side chart that cannot be drawn here; nothing otherwise
+            server_query: function (tab, start, end, channel, category, text, version, rollups) {
+                if (!(tab in charts) || (rollups && !(text && text.trim()))) return window.dash_clientside.no_update;
+                return {tab: tab, start_date: start, end_date: end, channel: channel, category: category,
+                        text: text, version: version};
+            }
+        };
+        Object.keys(charts).forEach(function (tab) {
+            clientside[tab] = function (activeTab, start, end, channel, category, text, rollups, serverFigure) {
+                if (activeTab !== tab) return window.dash_clientside.no_update;
+                if (rollups && !(text && text.trim())) return charts[tab](rollups, start, end, channel, category);
+                // Wait for the server's figure for exactly these filters
+                var query = serverFigure && serverFigure.query;
+                var current = query && query.tab === tab && same(query.start_date, start) &&
+                    same(query.end_date, end) && same(query.channel, channel) &&
+                    same(query.category, category) && same(query.text, text);
+                return current ? serverFigure.figure : window.dash_clientside.no_update;
+            };
+        });
+        return clientside;
+    })()
+});